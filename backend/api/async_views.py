@@ -0,0 +1,116 @@
+"""
+Асинхронные версии вьюх с долгим вводом-выводом.
+
+Подключаются в api/urls.py при ASYNC_VIEWS=True (по умолчанию в режиме
+SERVER_MODE=asgi) вместо одноимённых action'ов вьюсетов.
+"""
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.http import (FileResponse, HttpResponse, JsonResponse,
+                         StreamingHttpResponse)
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods
+
+from .authentication import aget_token_user
+from .serializer import AvatarSerializer
+from .shopping_list import (astream_shopping_list, cart_ingredients,
+                            cart_recipes, cart_version, file_name, stored_name)
+from .throttling import throttle_wait
+
+JSON_PARAMS = {'ensure_ascii': False}
+
+
+def unauthorized():
+    response = JsonResponse(
+        {'detail': 'Учетные данные не были предоставлены.'},
+        status=401, json_dumps_params=JSON_PARAMS
+    )
+    response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+@require_GET
+async def download_shopping_cart(request):
+    """
+    Выгрузка списка покупок: готовый файл фоновой задачи для текущей
+    версии корзины, иначе потоковая сборка из БД.
+    """
+
+    user = await aget_token_user(request)
+    if user is None:
+        return unauthorized()
+    request.user = user
+    wait = await sync_to_async(throttle_wait)(
+        request, 'download_shopping_cart'
+    )
+    if wait is not None:
+        response = JsonResponse(
+            {'detail': 'Запрос был проигнорирован из-за ограничения '
+                       'количества запросов.'},
+            status=429, json_dumps_params=JSON_PARAMS
+        )
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+    name = stored_name(user.id, await sync_to_async(cart_version)(user.id))
+    if await sync_to_async(default_storage.exists)(name):
+        return FileResponse(
+            await sync_to_async(default_storage.open)(name),
+            as_attachment=True,
+            filename=file_name(user)
+        )
+    recipes = [
+        recipe async for recipe in cart_recipes(user).values('name')
+    ]
+    response = StreamingHttpResponse(
+        astream_shopping_list(recipes, cart_ingredients(user)),
+        content_type='text/html; charset=utf-8'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{file_name(user)}"'
+    )
+    return response
+
+
+@csrf_exempt
+@require_http_methods(['PUT', 'DELETE'])
+async def avatar(request):
+    """
+    Добавление или удаление аватара текущего пользователя.
+
+    Декодирование изображения и запись файла выполняются в пуле потоков,
+    сохранение пользователя — асинхронным ORM.
+    """
+
+    user = await aget_token_user(request)
+    if user is None:
+        return unauthorized()
+    if request.method == 'DELETE':
+        await sync_to_async(user.avatar.delete)(save=False)
+        await user.asave(update_fields=('avatar',))
+        return HttpResponse(status=204)
+    try:
+        data = json.loads(request.body)
+    except ValueError as exc:
+        return JsonResponse(
+            {'detail': f'JSON parse error - {exc}'}, status=400,
+            json_dumps_params=JSON_PARAMS
+        )
+    serializer = AvatarSerializer(user, data=data, partial=True)
+    if not await sync_to_async(serializer.is_valid, thread_sensitive=False)():
+        return JsonResponse(
+            serializer.errors, status=400, json_dumps_params=JSON_PARAMS
+        )
+    image = serializer.validated_data.get('avatar')
+    if image is None:
+        user.avatar = None
+    else:
+        await sync_to_async(user.avatar.save, thread_sensitive=False)(
+            image.name, image, save=False
+        )
+    await user.asave(update_fields=('avatar',))
+    return JsonResponse(
+        AvatarSerializer(user).data, json_dumps_params=JSON_PARAMS
+    )
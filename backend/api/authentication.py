@@ -0,0 +1,175 @@
+"""
+Аутентификация по токену с кэшированием пользователя.
+
+Пользователь по токену ищется сначала в памяти воркера (короткий TTL,
+TOKEN_AUTH_LOCAL_TIMEOUT), затем в общем кэше (TOKEN_AUTH_CACHE_TIMEOUT) и
+только потом в БД. Общий кэш сбрасывается сигналами (api/signals.py) при
+удалении токена (выход через djoser) и изменении или удалении
+пользователя; память других воркеров устаревает не дольше её TTL.
+
+В кэше хранятся только поля AUTH_FIELDS (без хэша пароля), из них для
+каждого запроса собирается новый объект с отложенными остальными полями.
+is_active проверяется при каждом попадании. Запросы небезопасными
+методами (они могут сохранить пользователя) всегда читают его из БД.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+
+User = get_user_model()
+
+AUTH_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'avatar',
+    'is_active', 'is_staff', 'is_superuser',
+)
+# Метка сброшенной записи: не даёт запросу, прочитавшему пользователя из
+# БД до изменения, вернуть в кэш устаревшие поля.
+FORGOTTEN = 'forgotten'
+FORGOTTEN_TIMEOUT = 30
+
+
+def cache_key(key):
+    return 'token-auth:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+class LocalCache:
+    """LRU-кэш в памяти процесса с ограниченным временем жизни записей."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (value, time.monotonic() + self.timeout)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+local_users = LocalCache(
+    settings.TOKEN_AUTH_LOCAL_SIZE, settings.TOKEN_AUTH_LOCAL_TIMEOUT
+)
+
+
+def auth_values(user):
+    # Значения в виде для БД: аватар — имя файла, а не FieldFile.
+    return tuple(
+        user._meta.get_field(field).get_prep_value(getattr(user, field))
+        for field in AUTH_FIELDS
+    )
+
+
+def cached_user(values):
+    """Новый объект пользователя из кэша; остальные поля отложены."""
+
+    return User.from_db(DEFAULT_DB_ALIAS, AUTH_FIELDS, values)
+
+
+def remember(key, user):
+    values = auth_values(user)
+    if cache.add(cache_key(key), values, settings.TOKEN_AUTH_CACHE_TIMEOUT):
+        local_users.set(key, values)
+
+
+async def aremember(key, user):
+    values = auth_values(user)
+    if await cache.aadd(
+        cache_key(key), values, settings.TOKEN_AUTH_CACHE_TIMEOUT
+    ):
+        local_users.set(key, values)
+
+
+def forget(*keys):
+    """Сбрасывает закэшированных пользователей токенов."""
+
+    for key in keys:
+        local_users.delete(key)
+    cache.set_many(
+        {cache_key(key): FORGOTTEN for key in keys}, FORGOTTEN_TIMEOUT
+    )
+
+
+def found(values):
+    return values is not None and values != FORGOTTEN
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД для недавно виденных токенов."""
+
+    cached = True
+
+    def authenticate(self, request):
+        self.cached = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        values = local_users.get(key) if self.cached else None
+        if values is None and self.cached:
+            values = cache.get(cache_key(key))
+            if found(values):
+                local_users.set(key, values)
+        if found(values):
+            user = cached_user(values)
+            if not user.is_active:
+                raise AuthenticationFailed(_('User inactive or deleted.'))
+            return user, Token(key=key, user=user)
+        user, token = super().authenticate_credentials(key)
+        remember(key, user)
+        return user, token
+
+
+async def aget_token_user(request):
+    """
+    Асинхронный аналог TokenAuthentication для обычных async-вьюх Django.
+
+    Возвращает активного пользователя по заголовку
+    ``Authorization: Token <key>`` или None.
+    """
+
+    auth = request.headers.get('Authorization', '').split()
+    if len(auth) != 2 or auth[0].lower() != 'token':
+        return None
+    key = auth[1]
+    if request.method in SAFE_METHODS:
+        values = local_users.get(key) or await cache.aget(cache_key(key))
+        if found(values):
+            local_users.set(key, values)
+            user = cached_user(values)
+            return user if user.is_active else None
+    token = await Token.objects.select_related('user').filter(
+        key=key, user__is_active=True
+    ).afirst()
+    if token is None:
+        return None
+    await aremember(key, token.user)
+    return token.user
@@ -0,0 +1,141 @@
+"""
+Предсобранный каталог продуктов.
+
+Полный список продуктов (и корзины по первой букве названия) рендерится в
+JSON один раз, сжимается gzip и brotli и хранится в памяти воркера и на
+диске в INGREDIENT_CATALOG_ROOT. Файлы на диске nginx отдаёт напрямую, а
+их mtime служит меткой версии для всех воркеров.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from collections import defaultdict, namedtuple
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+
+from cookbook.models import Ingredient
+from .plain_serializers import serialize_ingredients
+from .renderers import FastJSONRenderer
+
+try:
+    import brotli
+except ImportError:  # Без brotli отдаём только gzip.
+    brotli = None
+
+CATALOG_FILE = 'ingredients.json'
+
+Blob = namedtuple('Blob', ('etag', 'identity', 'gzip', 'br'))
+
+_cache = {'version': None, 'blobs': {}}
+
+
+def make_blob(content):
+    """Рендерит и сжимает список продуктов."""
+
+    raw = FastJSONRenderer().render(content)
+    return Blob(
+        etag=hashlib.sha256(raw).hexdigest()[:32],
+        identity=raw,
+        gzip=gzip.compress(raw, compresslevel=9, mtime=0),
+        br=brotli.compress(raw) if brotli is not None else None,
+    )
+
+
+def make_blobs(ingredients):
+    """Полный каталог под ключом '' и корзины по первой букве."""
+
+    buckets = defaultdict(list)
+    for ingredient in ingredients:
+        buckets[ingredient['name'][:1].lower()].append(ingredient)
+    return {
+        '': make_blob(ingredients),
+        **{prefix: make_blob(items) for prefix, items in buckets.items()},
+    }
+
+
+def _write(path, content):
+    # Свой временный файл у каждого писателя: каталог может собираться
+    # одновременно в нескольких воркерах (get_blob при отсутствии файла).
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, prefix=f'.{path.name}.', delete=False
+    ) as tmp:
+        tmp.write(content)
+    try:
+        # NamedTemporaryFile создаёт файл с правами 0600, а nginx
+        # отдаёт каталог напрямую.
+        os.chmod(tmp.name, 0o644)
+        os.replace(tmp.name, path)
+    except OSError:
+        os.unlink(tmp.name)
+        raise
+
+
+def catalog_path():
+    return Path(settings.INGREDIENT_CATALOG_ROOT) / CATALOG_FILE
+
+
+def write_catalog():
+    """Пересобирает каталог из БД и сохраняет полный список на диск."""
+
+    path = catalog_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    blob = make_blob(serialize_ingredients(Ingredient.objects.all()))
+    _write(path.with_name(f'{path.name}.gz'), blob.gzip)
+    if blob.br is not None:
+        _write(path.with_name(f'{path.name}.br'), blob.br)
+    # Основной файл пишется последним: его mtime — версия каталога.
+    _write(path, blob.identity)
+    _cache['version'] = None
+
+
+def get_blob(prefix=''):
+    """Возвращает Blob для префикса или None, если продуктов нет."""
+
+    path = catalog_path()
+    try:
+        version = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        write_catalog()
+        version = path.stat().st_mtime_ns
+    if _cache['version'] != version:
+        _cache['blobs'] = make_blobs(json.loads(path.read_bytes()))
+        _cache['version'] = version
+    return _cache['blobs'].get(prefix)
+
+
+def _accepted_encodings(request):
+    return {
+        item.split(';')[0].strip()
+        for item in request.headers.get('Accept-Encoding', '').split(',')
+    }
+
+
+def catalog_response(request, prefix=''):
+    """Ответ с каталогом в наиболее сжатом из принимаемых клиентом видов."""
+
+    blob = get_blob(prefix)
+    if blob is None:
+        blob = make_blob([])
+    encodings = _accepted_encodings(request)
+    if blob.br is not None and 'br' in encodings:
+        encoding, body = 'br', blob.br
+    elif 'gzip' in encodings:
+        encoding, body = 'gzip', blob.gzip
+    else:
+        encoding, body = None, blob.identity
+    etag = f'"{blob.etag}-{encoding}"' if encoding else f'"{blob.etag}"'
+    if_none_match = request.headers.get('If-None-Match', '')
+    if blob.etag in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type='application/json')
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = 'public, no-cache'
+    return response
@@ -0,0 +1,71 @@
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def _query_values(request, param):
+    """Список значений параметра запроса, перечисленных через запятую."""
+
+    if request is None:
+        return ()
+    params = getattr(request, 'query_params', request.GET)
+    return tuple(
+        item for item in (
+            value.strip() for value in params.get(param, '').split(',')
+        ) if item
+    )
+
+
+def selected_fields(request, names, path=''):
+    """
+    Возвращает поля из names, которые нужно отдать клиенту.
+
+    ?fields= оставляет только перечисленные поля, ?omit= исключает поля.
+    Вложенные поля задаются через точку: fields=name,author.username.
+    path — путь вложенного сериализатора ('' для корневого).
+    """
+
+    prefix = f'{path}.' if path else ''
+
+    def level(param, leaf_only):
+        result = set()
+        for item in _query_values(request, param):
+            if not item.startswith(prefix):
+                continue
+            rest = item[len(prefix):]
+            if not rest or leaf_only and '.' in rest:
+                continue
+            result.add(rest.split('.', 1)[0])
+        return result
+
+    wanted = level(FIELDS_PARAM, leaf_only=False)
+    omitted = level(OMIT_PARAM, leaf_only=True)
+    return [
+        name for name in names
+        if (not wanted or name in wanted) and name not in omitted
+    ]
+
+
+class SparseFieldsetsMixin:
+    """
+    Примесь для сериализаторов с поддержкой ?fields= и ?omit=.
+
+    Лишние поля убираются до сериализации, поэтому их
+    SerializerMethodField и вложенные сериализаторы не вычисляются.
+    """
+
+    @property
+    def field_path(self):
+        names = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return '.'.join(reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        keep = selected_fields(
+            self.context.get('request'), fields, self.field_path
+        )
+        return {name: fields[name] for name in keep}
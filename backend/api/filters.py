@@ -1,8 +1,14 @@
-from django_filters import (BooleanFilter, CharFilter, FilterSet,
-                            ModelMultipleChoiceFilter, NumberFilter)
+from django.db.models import Exists, OuterRef
+from django_filters import (BooleanFilter, CharFilter, ChoiceFilter,
+                            FilterSet, ModelMultipleChoiceFilter, NumberFilter)
 from django_filters.widgets import BooleanWidget
 
-from cookbook.models import Ingredient, Recipe, Tag
+from cookbook.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                             Tag)
+from .relations import relation_ids
+
+TAGS_MATCH_ANY = 'any'
+TAGS_MATCH_ALL = 'all'
 
 
 class RecipeFilter(FilterSet):
@@ -12,29 +18,62 @@ class RecipeFilter(FilterSet):
         widget=BooleanWidget(), method='filter_in_shopping_cart')
     author = NumberFilter(field_name='author__id')
     tags = ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug', to_field_name='slug'
+        queryset=Tag.objects.only('id', 'slug'),
+        to_field_name='slug', method='filter_tags'
+    )
+    tags_match = ChoiceFilter(
+        choices=((TAGS_MATCH_ANY, 'Любой из тегов'),
+                 (TAGS_MATCH_ALL, 'Все теги')),
+        method='filter_tags_match'
     )
 
     class Meta:
         model = Recipe
-        fields = ('is_favorited', 'tags', 'author', 'is_in_shopping_cart')
+        fields = ('is_favorited', 'tags', 'tags_match', 'author',
+                  'is_in_shopping_cart')
 
-    def filter_is_favorited(self, recipes, name, value):
-        user = self.request.user
-        if not user or user.is_anonymous:
+    def filter_tags(self, recipes, name, tags):
+        """
+        Фильтр по тегам через EXISTS по связующей таблице: без JOIN рецептов
+        с тегами, дублей строк и DISTINCT. Слаги уже превращены в теги
+        одним запросом при валидации формы.
+        """
+
+        if not tags:
             return recipes
-        if value:
-            return recipes.filter(favorites__user=user)
-        return recipes.exclude(favorites__user=user)
+        recipe_tags = Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk')
+        )
+        if self.form.cleaned_data.get('tags_match') == TAGS_MATCH_ALL:
+            for tag in tags:
+                recipes = recipes.filter(
+                    Exists(recipe_tags.filter(tag_id=tag.id))
+                )
+            return recipes
+        return recipes.filter(
+            Exists(recipe_tags.filter(tag_id__in=[tag.id for tag in tags]))
+        )
+
+    def filter_tags_match(self, recipes, name, value):
+        # Режим учитывается в filter_tags.
+        return recipes
+
+    def filter_user_relation(self, recipes, model, value):
+        """Фильтр по кэшированному множеству id рецептов пользователя."""
 
-    def filter_in_shopping_cart(self, recipes, name, value):
         user = self.request.user
         if not user or user.is_anonymous:
             return recipes
+        ids = relation_ids(self.request, model)
         if value:
-            return recipes.filter(shoppingcarts__user=user)
-        return recipes.exclude(shoppingcarts__user=user)
+            return recipes.filter(pk__in=ids)
+        return recipes.exclude(pk__in=ids)
+
+    def filter_is_favorited(self, recipes, name, value):
+        return self.filter_user_relation(recipes, Favorite, value)
+
+    def filter_in_shopping_cart(self, recipes, name, value):
+        return self.filter_user_relation(recipes, ShoppingCart, value)
 
 
 class IngredientFilter(FilterSet):
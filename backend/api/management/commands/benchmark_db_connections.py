@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+
+from api.views import RecipeViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнить время списка рецептов с новым соединением к БД на каждый '
+        'запрос и с текущими настройками переиспользования'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def recipe_list(self):
+        view = RecipeViewSet.as_view({'get': 'list'})
+        request = APIRequestFactory().get(
+            '/api/recipes/', HTTP_HOST=settings.ALLOWED_HOSTS[0]
+        )
+
+        def call():
+            # Как в обработчике запросов Django: сигналы закрывают
+            # соединения по CONN_MAX_AGE или возвращают их в пул.
+            request_started.send(sender=self.__class__)
+            view(request).render()
+            request_finished.send(sender=self.__class__)
+        return call
+
+    def measure(self, call, count, reconnect):
+        timings = []
+        for _ in range(count):
+            if reconnect:
+                connection.close()
+                if hasattr(connection, 'close_pool'):
+                    connection.close_pool()
+            started = time.perf_counter()
+            call()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), statistics.mean(timings)
+
+    def handle(self, *args, **options):
+        call = self.recipe_list()
+        count = options['requests']
+        call()
+        for title, reconnect in (
+            ('Новое соединение на запрос', True),
+            ('Текущие настройки', False),
+        ):
+            median, mean = self.measure(call, count, reconnect)
+            self.stdout.write(
+                f'{title}: медиана {median:.2f} мс, среднее {mean:.2f} мс'
+            )
+        settings_dict = connection.settings_dict
+        self.stdout.write(self.style.SUCCESS(
+            f'CONN_MAX_AGE={settings_dict["CONN_MAX_AGE"]}, '
+            f'pool={bool(settings_dict["OPTIONS"].get("pool"))}'
+        ))
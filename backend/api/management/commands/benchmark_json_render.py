@@ -0,0 +1,89 @@
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer, orjson
+
+WORDS = (
+    'картофель', 'морковь', 'лук', 'чеснок', 'говядина', 'сливки', 'соль',
+    'перец', 'мука', 'яйцо', 'сахар', 'молоко', 'масло', 'укроп', 'томат',
+)
+
+
+def fake_recipe(recipe_id, ingredients_count):
+    """Рецепт в том виде, в каком его отдаёт RecipeSerializer."""
+
+    return {
+        'id': recipe_id,
+        'tags': [
+            {'id': 1, 'name': 'Завтрак', 'slug': 'breakfast'},
+            {'id': 2, 'name': 'Обед', 'slug': 'lunch'},
+        ],
+        'author': {
+            'email': f'user{recipe_id}@example.com',
+            'id': recipe_id,
+            'username': f'user{recipe_id}',
+            'first_name': 'Иван',
+            'last_name': 'Петров',
+            'avatar': None,
+            'is_subscribed': False,
+        },
+        'ingredients': [
+            {
+                'id': index,
+                'name': random.choice(WORDS),
+                'measurement_unit': 'г',
+                'amount': random.randint(1, 500),
+            }
+            for index in range(ingredients_count)
+        ],
+        'is_favorited': False,
+        'is_in_shopping_cart': False,
+        'name': ' '.join(random.choices(WORDS, k=3)).capitalize(),
+        'image': f'http://localhost/media/recipes/{recipe_id}.png',
+        'text': ' '.join(random.choices(WORDS, k=200)),
+        'cooking_time': random.randint(1, 180),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Сравнить скорость JSON-рендереров на сгенерированных рецептах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--ingredients', type=int, default=15)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        page = {
+            'count': page_size,
+            'next': None,
+            'previous': None,
+            'results': [
+                fake_recipe(recipe_id, options['ingredients'])
+                for recipe_id in range(1, page_size + 1)
+            ],
+        }
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson не установлен, FastJSONRenderer использует json.'
+            ))
+        results = {}
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            seconds = min(timeit.repeat(
+                lambda: renderer.render(page), number=options['repeat'],
+                repeat=3
+            ))
+            results[type(renderer).__name__] = seconds
+            self.stdout.write(
+                f'{type(renderer).__name__}: '
+                f'{seconds / options["repeat"] * 1000:.3f} мс на страницу, '
+                f'{len(renderer.render(page))} байт'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Ускорение: '
+            f'{results["JSONRenderer"] / results["FastJSONRenderer"]:.1f}x'
+        ))
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.catalog import catalog_path, write_catalog
+
+
+class Command(BaseCommand):
+    help = 'Собрать сжатый JSON-каталог продуктов для nginx и API'
+
+    def handle(self, *args, **options):
+        write_catalog()
+        self.stdout.write(self.style.SUCCESS(
+            f'Каталог продуктов сохранён в {catalog_path()} '
+            f'(INGREDIENT_CATALOG={settings.INGREDIENT_CATALOG}).'
+        ))
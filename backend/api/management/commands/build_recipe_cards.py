@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from api.recipe_cards import refresh
+from cookbook.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Пересобрать карточки рецептов для чтения через API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+        size = options['batch_size']
+        for start in range(0, len(recipe_ids), size):
+            refresh(recipe_ids[start:start + size])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано карточек рецептов: {len(recipe_ids)}.'
+        ))
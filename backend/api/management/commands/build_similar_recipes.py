@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.similar_recipes import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать списки похожих рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитаны похожие рецепты для {count} рецептов.'
+        ))
@@ -0,0 +1,344 @@
+import http.client
+import json
+import math
+import random
+import re
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from cookbook.models import Recipe, Tag
+
+User = get_user_model()
+
+COLLECTION = (
+    settings.BASE_DIR.parent / 'postman_collection'
+    / 'foodgram.postman_collection.json'
+)
+# Сценарий -> (вес, запросы коллекции по порядку). Парные запросы
+# (добавить/убрать) оставляют данные в исходном состоянии.
+SCENARIOS = {
+    'browse': (50, ('get_recipes_list // User', 'get_recipe_detail // User')),
+    'filter_tags': (20, ('get_recipes_list_with_two_tags_param // User',)),
+    'favorite': (
+        10, ('add_to_favorite // User', 'remove_from_favorite // User')
+    ),
+    'shopping_cart': (
+        10,
+        ('add_to_shopping_cart // User', 'remove_from_shopping_cart // User')
+    ),
+    'download': (5, ('download_shopping_cart // User',)),
+    'subscribe': (
+        5, ('create_subscription // User', 'delete_first_subscription // User')
+    ),
+}
+PERCENTILES = (50, 90, 95, 99)
+VARIABLE = re.compile(r'{{(\w+)}}')
+
+
+def collection_requests(path):
+    """Запросы postman-коллекции по имени."""
+
+    requests = {}
+
+    def walk(items):
+        for item in items:
+            if 'item' in item:
+                walk(item['item'])
+            else:
+                requests.setdefault(item['name'], item['request'])
+
+    with open(path, encoding='utf-8') as file:
+        walk(json.load(file)['item'])
+    return requests
+
+
+def percentile(latencies, value):
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+
+    return latencies[max(math.ceil(len(latencies) * value / 100) - 1, 0)]
+
+
+class VirtualUser(threading.Thread):
+    """
+    Пользователь под своим токеном: до окончания теста выполняет случайные
+    сценарии и записывает (запрос, задержка, статус) каждого ответа.
+    Статус 0 — ошибка соединения.
+    """
+
+    def __init__(self, command, user, token, seed):
+        super().__init__(daemon=True)
+        self.command = command
+        self.user = user
+        self.token = token
+        self.random = random.Random(seed)
+        self.results = []
+        self.iterations = Counter()
+        self.connection = None
+
+    def variables(self):
+        pools = self.command.pools
+        authors = [
+            author for author in pools['authors'] if author != self.user.id
+        ] or pools['authors']
+        second_tag, third_tag = (
+            self.random.sample(pools['tags'], 2) if len(pools['tags']) > 1
+            else pools['tags'] * 2
+        )
+        return {
+            'baseUrl': self.command.base_url,
+            'userToken': self.token,
+            'userId': self.user.id,
+            'firstRecipeId': self.random.choice(pools['recipes']),
+            'secondTagSlug': second_tag,
+            'thirdTagSlug': third_tag,
+            'thirdUserId': self.random.choice(authors),
+        }
+
+    def send(self, request, variables):
+        def fill(text):
+            return VARIABLE.sub(
+                lambda match: str(variables[match.group(1)]), text
+            )
+
+        url = urlsplit(fill(request['url']['raw']))
+        headers = {
+            header['key']: fill(header['value'])
+            for header in request.get('header', [])
+            if not header.get('disabled')
+        }
+        auth = request.get('auth', {})
+        if auth.get('type') == 'apikey':
+            apikey = {item['key']: item['value'] for item in auth['apikey']}
+            headers[apikey['key']] = fill(apikey['value'])
+        body = fill(request.get('body', {}).get('raw', '')).encode() or None
+        if body:
+            headers.setdefault('Content-Type', 'application/json')
+        path = url.path + (f'?{url.query}' if url.query else '')
+        if self.connection is None:
+            self.connection = self.command.connect()
+        started = time.perf_counter()
+        try:
+            self.connection.request(
+                request['method'], path, body=body, headers=headers
+            )
+            response = self.connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            status = 0
+        return time.perf_counter() - started, status
+
+    def run(self):
+        names = list(self.command.scenarios)
+        weights = [self.command.scenarios[name] for name in names]
+        while time.monotonic() < self.command.deadline:
+            scenario = self.random.choices(names, weights)[0]
+            variables = self.variables()
+            for name in SCENARIOS[scenario][1]:
+                latency, status = self.send(
+                    self.command.requests[name], variables
+                )
+                self.results.append(
+                    (name.split(' //')[0], latency, status)
+                )
+            self.iterations[scenario] += 1
+        if self.connection is not None:
+            self.connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест API по сценариям из postman-коллекции: '
+        'RPS, перцентили задержки и доля ошибок по эндпоинтам в JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--collection', default=str(COLLECTION))
+        parser.add_argument(
+            '--users', type=int, default=20,
+            help='Число одновременных пользователей (потоков)'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=30, help='Секунды'
+        )
+        parser.add_argument(
+            '--scenario', action='append', metavar='ИМЯ=ВЕС',
+            help=f'Вес сценария, по умолчанию все: {", ".join(SCENARIOS)}'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=1000,
+            help='Сколько последних рецептов участвует в тесте'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--label', help='Метка прогона, по умолчанию '
+                                            'текущий коммит')
+        parser.add_argument('--output', help='Файл для отчёта')
+
+    def connect(self):
+        url = urlsplit(self.base_url)
+        connection_class = (
+            http.client.HTTPSConnection if url.scheme == 'https'
+            else http.client.HTTPConnection
+        )
+        return connection_class(url.netloc, timeout=60)
+
+    def parse_scenarios(self, values):
+        if not values:
+            return {name: weight for name, (weight, _) in SCENARIOS.items()}
+        scenarios = {}
+        for value in values:
+            name, _, weight = value.partition('=')
+            if name not in SCENARIOS:
+                raise CommandError(f'Неизвестный сценарий: {name}.')
+            try:
+                scenarios[name] = (
+                    float(weight) if weight else SCENARIOS[name][0]
+                )
+            except ValueError:
+                raise CommandError(f'Неверный вес сценария: {value}.')
+        return scenarios
+
+    def load_requests(self, path):
+        try:
+            requests = collection_requests(path)
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать коллекцию: {error}')
+        names = {
+            name for scenario in self.scenarios
+            for name in SCENARIOS[scenario][1]
+        }
+        missing = names - requests.keys()
+        if missing:
+            raise CommandError(
+                f'В коллекции нет запросов: {", ".join(sorted(missing))}.'
+            )
+        return {name: requests[name] for name in names}
+
+    def load_pools(self, size):
+        recipes = list(Recipe.objects.order_by('-pub_date').values_list(
+            'id', 'author_id'
+        )[:size])
+        tags = list(Tag.objects.values_list('slug', flat=True))
+        if not recipes or not tags:
+            raise CommandError(
+                'Нужны рецепты и теги: заполните базу перед тестом.'
+            )
+        return {
+            'recipes': [recipe_id for recipe_id, _ in recipes],
+            'authors': sorted({author_id for _, author_id in recipes}),
+            'tags': tags,
+        }
+
+    def load_users(self, count):
+        """Пользователи loadtest-N с токенами, создаются при первом запуске."""
+
+        users = []
+        for number in range(count):
+            user, _ = User.objects.get_or_create(
+                username=f'loadtest-{number}',
+                defaults={
+                    'email': f'loadtest-{number}@example.com',
+                    'first_name': 'Нагрузочный',
+                    'last_name': f'Тест {number}',
+                }
+            )
+            token, _ = Token.objects.get_or_create(user=user)
+            users.append((user, token.key))
+        return users
+
+    def label(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def endpoint_report(self, results, elapsed):
+        latencies = sorted(latency for latency, _ in results)
+        statuses = Counter(status for _, status in results)
+        errors = sum(
+            count for status, count in statuses.items()
+            if status == 0 or status >= 400
+        )
+        return {
+            'requests': len(results),
+            'rps': round(len(results) / elapsed, 1),
+            **{
+                f'p{value}_ms': round(
+                    percentile(latencies, value) * 1000, 1
+                )
+                for value in PERCENTILES
+            },
+            'max_ms': round(latencies[-1] * 1000, 1),
+            'errors': errors,
+            'error_rate': round(errors / len(results), 4),
+            'statuses': {
+                str(status): count for status, count in sorted(
+                    statuses.items()
+                )
+            },
+        }
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self.scenarios = self.parse_scenarios(options['scenario'])
+        self.requests = self.load_requests(options['collection'])
+        self.pools = self.load_pools(options['recipes'])
+        users = [
+            VirtualUser(self, user, token, options['seed'] + number)
+            for number, (user, token) in enumerate(
+                self.load_users(options['users'])
+            )
+        ]
+        started = time.perf_counter()
+        self.deadline = time.monotonic() + options['duration']
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.perf_counter() - started
+        by_endpoint = defaultdict(list)
+        iterations = Counter()
+        for user in users:
+            for name, latency, status in user.results:
+                by_endpoint[name].append((latency, status))
+            iterations.update(user.iterations)
+        results = [
+            result for endpoint in by_endpoint.values() for result in endpoint
+        ]
+        if not results:
+            raise CommandError('Не выполнено ни одного запроса.')
+        report = {
+            'label': options['label'] or self.label(),
+            'base_url': self.base_url,
+            'users': options['users'],
+            'duration_s': round(elapsed, 1),
+            'total': self.endpoint_report(results, elapsed),
+            'endpoints': {
+                name: self.endpoint_report(endpoint, elapsed)
+                for name, endpoint in sorted(by_endpoint.items())
+            },
+            'scenarios': {
+                name: {'weight': weight, 'iterations': iterations[name]}
+                for name, weight in self.scenarios.items()
+            },
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
@@ -0,0 +1,100 @@
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Прозрачный PNG 1x1 для загрузки аватара.
+PNG_1X1 = (
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAC'
+    'hwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+SCENARIOS = {
+    'download': ('GET', '/api/recipes/download_shopping_cart/', None),
+    'avatar': (
+        'PUT', '/api/users/me/avatar/',
+        {'avatar': f'data:image/png;base64,{PNG_1X1}'}
+    ),
+    'short-link': ('GET', '/s/{recipe}/', None),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест I/O-эндпоинтов: сравнение пропускной способности '
+        'WSGI и ASGI развёртываний'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'targets', nargs='+',
+            help='Развёртывания в виде имя=URL, например '
+                 'wsgi=http://localhost:8001 asgi=http://localhost:8002'
+        )
+        parser.add_argument('--token', required=True)
+        parser.add_argument('--recipe', type=int, default=1)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS,
+            help='По умолчанию все сценарии'
+        )
+
+    def call(self, base_url, scenario, token, recipe):
+        method, path, payload = SCENARIOS[scenario]
+        request = Request(
+            base_url + path.format(recipe=recipe),
+            method=method,
+            data=json.dumps(payload).encode() if payload else None,
+            headers={
+                'Authorization': f'Token {token}',
+                'Content-Type': 'application/json',
+            }
+        )
+        started = time.perf_counter()
+        try:
+            with urlopen(request, timeout=60) as response:
+                response.read()
+                ok = response.status < 400
+        except HTTPError as error:
+            ok = error.code < 400
+        except URLError:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    def run(self, base_url, scenario, options):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(
+                lambda _: self.call(
+                    base_url, scenario, options['token'], options['recipe']
+                ),
+                range(options['requests'])
+            ))
+        elapsed = time.perf_counter() - started
+        latencies = sorted(latency for latency, _ in results)
+        return {
+            'rps': round(len(results) / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 1),
+            'p95_ms': round(
+                latencies[int(len(latencies) * 0.95) - 1] * 1000, 1
+            ),
+            'errors': sum(1 for _, ok in results if not ok),
+        }
+
+    def handle(self, *args, **options):
+        targets = dict(target.split('=', 1) for target in options['targets'])
+        if not targets:
+            raise CommandError('Не указано ни одного развёртывания.')
+        report = {
+            name: {
+                scenario: self.run(base_url.rstrip('/'), scenario, options)
+                for scenario in options['scenario'] or SCENARIOS
+            }
+            for name, base_url in targets.items()
+        }
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.throttling import rejected_counts
+
+
+class Command(BaseCommand):
+    help = 'Показать число запросов, отклонённых лимитами, по областям'
+
+    def handle(self, *args, **options):
+        rates = settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+        for scope, count in rejected_counts(rates).items():
+            self.stdout.write(f'{scope} ({rates[scope]}): {count}')
@@ -0,0 +1,141 @@
+"""
+Поиск «что приготовить из того, что есть».
+
+Инвертированный индекс продукт -> отсортированный массив id рецептов
+хранится в памяти воркера и строится из RecipeIngredient при первом
+запросе. Оценка рецептов — подсчёт совпадений по массивам выбранных
+продуктов, без GROUP BY по всей таблице RecipeIngredient.
+
+Изменения рецептов (changed) записываются в общий кэш как журнал
+«версия -> id рецепта»; каждый воркер перед поиском догоняет журнал и
+перечитывает только изменённые рецепты. Если журнал устарел или слишком
+длинный, индекс строится заново.
+"""
+import bisect
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from cookbook.models import RecipeIngredient
+
+VERSION_KEY = 'pantry-index:version'
+
+
+def change_key(version):
+    return f'pantry-index:change:{version}'
+
+
+def changed(recipe_ids):
+    """Отмечает рецепты для перечитывания после фиксации транзакции."""
+
+    def log():
+        cache.add(VERSION_KEY, 0, None)
+        if len(recipe_ids) > settings.PANTRY_MAX_CHANGES:
+            # Такой разрыв версий воркеры всё равно закрывают полной
+            # перестройкой индекса, журнал им не нужен.
+            cache.incr(VERSION_KEY, len(recipe_ids))
+            return
+        for recipe_id in recipe_ids:
+            cache.set(
+                change_key(cache.incr(VERSION_KEY)), recipe_id,
+                settings.PANTRY_CHANGES_TIMEOUT
+            )
+    transaction.on_commit(log)
+
+
+class PantryIndex:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.postings = {}
+        self.recipes = {}
+
+    def build(self):
+        version = cache.get(VERSION_KEY, 0)
+        postings = defaultdict(lambda: array('L'))
+        recipes = defaultdict(list)
+        rows = RecipeIngredient.objects.order_by(
+            'ingredient_id', 'recipe_id'
+        ).values_list('ingredient_id', 'recipe_id').iterator(chunk_size=10000)
+        for ingredient_id, recipe_id in rows:
+            postings[ingredient_id].append(recipe_id)
+            recipes[recipe_id].append(ingredient_id)
+        self.postings = dict(postings)
+        self.recipes = {
+            recipe_id: tuple(ingredients)
+            for recipe_id, ingredients in recipes.items()
+        }
+        self.version = version
+
+    def remove(self, recipe_id):
+        for ingredient_id in self.recipes.pop(recipe_id, ()):
+            recipe_ids = self.postings[ingredient_id]
+            del recipe_ids[bisect.bisect_left(recipe_ids, recipe_id)]
+
+    def apply(self, recipe_ids):
+        """Перечитывает состав рецептов recipe_ids одним запросом."""
+
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+        for recipe_id in recipe_ids:
+            self.remove(recipe_id)
+            if recipe_id not in ingredients:
+                continue
+            self.recipes[recipe_id] = tuple(ingredients[recipe_id])
+            for ingredient_id in ingredients[recipe_id]:
+                bisect.insort(
+                    self.postings.setdefault(ingredient_id, array('L')),
+                    recipe_id
+                )
+
+    def sync(self):
+        current = cache.get(VERSION_KEY, 0)
+        if self.version is not None and current == self.version:
+            return
+        with self.lock:
+            if self.version is not None and current <= self.version:
+                return
+            if self.version is None or (
+                current - self.version > settings.PANTRY_MAX_CHANGES
+            ):
+                self.build()
+                return
+            versions = range(self.version + 1, current + 1)
+            changes = cache.get_many([change_key(v) for v in versions])
+            if len(changes) < len(versions):
+                # Часть журнала вытеснена из кэша.
+                self.build()
+                return
+            self.apply(set(changes.values()))
+            self.version = current
+
+    def search(self, ingredient_ids):
+        """
+        Рецепты, где есть хотя бы один из продуктов, по убыванию доли
+        имеющихся продуктов, затем по числу недостающих.
+
+        Возвращает список (id рецепта, доля, число недостающих).
+        """
+
+        self.sync()
+        hits = Counter()
+        for ingredient_id in set(ingredient_ids):
+            hits.update(self.postings.get(ingredient_id, ()))
+        results = []
+        for recipe_id, found in hits.items():
+            total = len(self.recipes.get(recipe_id, ()))
+            if total:
+                results.append((recipe_id, found / total, total - found))
+        results.sort(key=lambda result: (-result[1], result[2], -result[0]))
+        return results
+
+
+index = PantryIndex()
@@ -0,0 +1,107 @@
+"""
+Быстрое чтение для горячих списков без механики ModelSerializer.
+
+Функции собирают словари прямо из .values()-запросов и карточек рецептов
+(api/recipe_cards.py) и отдают ровно то же, что TagSerializer,
+IngredientSerializer и RecipeSerializer (включая порядок ключей и
+?fields=/?omit=). Соответствие проверяют тесты api/tests.py.
+"""
+from django.contrib.auth import get_user_model
+
+from cookbook.models import Favorite, Recipe, ShoppingCart, Subscription
+from .fieldsets import selected_fields
+from .recipe_cards import get_documents
+from .relations import relation_ids
+from .serializer import (IngredientSerializer, RecipeIngredientSerializer,
+                         RecipeSerializer, TagSerializer, UserReadSerializer)
+
+User = get_user_model()
+
+
+def file_url(request, field, name):
+    """Повторяет FileField.to_representation для имени файла из .values()."""
+
+    if not name:
+        return None
+    url = field.storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def serialize_tags(tags):
+    return list(tags.values(*TagSerializer.Meta.fields))
+
+
+def serialize_ingredients(ingredients):
+    return list(ingredients.values(*IngredientSerializer.Meta.fields))
+
+
+def serialize_recipes(recipe_ids, request, extra=None):
+    """
+    Список представлений RecipeSerializer в порядке recipe_ids.
+
+    Общая часть берётся из карточек рецептов, поверх неё добавляются
+    флаги текущего пользователя и абсолютные адреса файлов. extra —
+    дополнительные поля по id рецепта. Рецепты, удалённые к моменту
+    чтения, пропускаются.
+
+    jsonb не сохраняет порядок ключей, поэтому вложенные словари
+    собираются заново в порядке полей сериализаторов.
+    """
+
+    recipe_ids = list(recipe_ids)
+    fields = selected_fields(request, RecipeSerializer.Meta.fields)
+    author_fields = selected_fields(
+        request, UserReadSerializer.Meta.fields, 'author'
+    )
+    documents = get_documents(recipe_ids)
+    favorited = (
+        relation_ids(request, Favorite)
+        if 'is_favorited' in fields else frozenset()
+    )
+    in_cart = (
+        relation_ids(request, ShoppingCart)
+        if 'is_in_shopping_cart' in fields else frozenset()
+    )
+    subscribed = (
+        relation_ids(request, Subscription)
+        if 'author' in fields and 'is_subscribed' in author_fields
+        else frozenset()
+    )
+    tag_fields = TagSerializer.Meta.fields
+    ingredient_fields = RecipeIngredientSerializer.Meta.fields
+    image_field = Recipe._meta.get_field('image')
+    avatar_field = User._meta.get_field('avatar')
+    data = []
+    for recipe_id in recipe_ids:
+        document = documents.get(recipe_id)
+        if document is None:
+            continue
+        author = {
+            **document['author'],
+            'avatar': file_url(
+                request, avatar_field, document['author']['avatar']
+            ),
+            'is_subscribed': document['author']['id'] in subscribed,
+        }
+        values = {
+            **document,
+            'tags': [
+                {name: tag[name] for name in tag_fields}
+                for tag in document['tags']
+            ],
+            'ingredients': [
+                {name: ingredient[name] for name in ingredient_fields}
+                for ingredient in document['ingredients']
+            ],
+            'image': file_url(request, image_field, document['image']),
+            'author': {name: author[name] for name in author_fields},
+            'is_favorited': recipe_id in favorited,
+            'is_in_shopping_cart': recipe_id in in_cart,
+        }
+        data.append({
+            **{name: values[name] for name in fields},
+            **(extra or {}).get(recipe_id, {}),
+        })
+    return data
@@ -0,0 +1,121 @@
+"""
+Карточки рецептов — материализованное представление для чтения.
+
+Карточка (cookbook.RecipeCard) хранит то, что RecipeSerializer собирает из
+пяти таблиц: теги, продукты с названиями и единицами, данные автора.
+Флаги текущего пользователя и абсолютные адреса файлов в неё не входят и
+добавляются при чтении (plain_serializers.serialize_recipes). Карточки
+пересобираются при записи рецепта через API и админку, изменении автора,
+тегов и продуктов (api/signals.py) и командой build_recipe_cards.
+"""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from cookbook.models import Recipe, RecipeCard, RecipeIngredient
+from .serializer import (RecipeIngredientSerializer, TagSerializer,
+                         UserReadSerializer)
+
+User = get_user_model()
+
+INGREDIENT_SOURCES = {
+    'id': 'ingredient__id',
+    'name': 'ingredient__name',
+    'measurement_unit': 'ingredient__measurement_unit',
+    'amount': 'amount',
+}
+# Поля, зависящие от пользователя, вычисляются при чтении.
+USER_FIELDS = ('is_favorited', 'is_in_shopping_cart', 'is_subscribed')
+RECIPE_COLUMNS = ('name', 'image', 'text', 'cooking_time')
+AUTHOR_FIELDS = tuple(
+    name for name in UserReadSerializer.Meta.fields
+    if name not in USER_FIELDS
+)
+
+
+def recipe_tags(recipe_ids):
+    tags = defaultdict(list)
+    rows = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag__name').values(
+        'recipe_id', *(f'tag__{name}' for name in TagSerializer.Meta.fields)
+    )
+    for row in rows:
+        tags[row['recipe_id']].append({
+            name: row[f'tag__{name}'] for name in TagSerializer.Meta.fields
+        })
+    return tags
+
+
+def recipe_ingredients(recipe_ids):
+    ingredients = defaultdict(list)
+    names = RecipeIngredientSerializer.Meta.fields
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('ingredient__name').values(
+        'recipe_id', *(INGREDIENT_SOURCES[name] for name in names)
+    )
+    for row in rows:
+        ingredients[row['recipe_id']].append({
+            name: row[INGREDIENT_SOURCES[name]] for name in names
+        })
+    return ingredients
+
+
+def build_documents(recipe_ids):
+    """Документы карточек (id рецепта -> документ) за четыре запроса."""
+
+    rows = list(Recipe.objects.filter(id__in=recipe_ids).order_by().values(
+        'id', 'author_id', *RECIPE_COLUMNS
+    ))
+    recipe_ids = [row['id'] for row in rows]
+    tags = recipe_tags(recipe_ids)
+    ingredients = recipe_ingredients(recipe_ids)
+    authors = {
+        author['id']: author for author in User.objects.filter(
+            id__in={row['author_id'] for row in rows}
+        ).order_by().values(*AUTHOR_FIELDS)
+    }
+    documents = {}
+    for row in rows:
+        author_id = row.pop('author_id')
+        documents[row['id']] = {
+            **row,
+            'tags': tags.get(row['id'], []),
+            'ingredients': ingredients.get(row['id'], []),
+            'author': authors[author_id],
+        }
+    return documents
+
+
+def refresh(recipe_ids):
+    """Пересобирает карточки рецептов и возвращает их документы."""
+
+    with transaction.atomic():
+        documents = build_documents(recipe_ids)
+        RecipeCard.objects.bulk_create(
+            (
+                RecipeCard(recipe_id=recipe_id, document=document)
+                for recipe_id, document in documents.items()
+            ),
+            update_conflicts=True,
+            unique_fields=['recipe'],
+            update_fields=['document', 'updated_at']
+        )
+    return documents
+
+
+def get_documents(recipe_ids):
+    """
+    Документы карточек одним запросом; недостающие карточки (рецепты,
+    созданные до появления карточек) собираются и сохраняются на лету.
+    """
+
+    documents = dict(RecipeCard.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'document'))
+    missing = set(recipe_ids) - documents.keys()
+    if missing:
+        documents.update(refresh(missing))
+    return documents
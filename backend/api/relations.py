@@ -0,0 +1,197 @@
+"""
+Кэш множеств id, связанных с пользователем: избранное, корзина, подписки.
+
+По ним вычисляются is_favorited, is_in_shopping_cart и is_subscribed и
+фильтры ?is_favorited=/?is_in_shopping_cart=: вместо запроса на каждый
+объект — проверка вхождения в множество. Множество хранится в общем кэше
+под ключом с версией; при изменении связи (changed) версия растёт, и
+следующее чтение собирает множество заново. Версия читается до запроса в
+БД, а растёт после фиксации транзакции, поэтому запрос, начатый до
+изменения, не перезапишет свежие данные. Версии поднимают сигналы
+(api/signals.py), в том числе для связей, удаляемых каскадом в БД.
+В пределах одного запроса множество запоминается на объекте request.
+
+changes_since отдаёт клиенту изменения этих множеств по журналу
+RelationChange после курсора синхронизации. id записи выдаётся при
+вставке, а видна она после фиксации транзакции, так что запись с меньшим
+id может появиться позже записи с большим. Поэтому курсор сдвигается
+только за записи старше RELATION_CHANGES_SETTLE_TIME (дольше любой
+транзакции, пишущей в журнал): к этому времени все записи с меньшими id
+уже зафиксированы. Более свежие записи отдаются сразу, но повторяются в
+следующем ответе; повтор не меняет итог, так как побеждает последнее
+изменение связи.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from cookbook.models import (Favorite, RelationChange, ShoppingCart,
+                             Subscription)
+
+# Поле модели связи с id объекта; у остальных моделей — recipe_id.
+RELATED_FIELDS = {Subscription: 'author_id'}
+# Ключи ответа синхронизации для моделей связей.
+SYNC_KEYS = {
+    Favorite: 'favorites',
+    ShoppingCart: 'shopping_cart',
+    Subscription: 'subscriptions',
+}
+
+
+def relation_key(user_id, model):
+    return f'user-relations:{user_id}:{model._meta.model_name}'
+
+
+def version_key(user_id, model):
+    # Начальная версия — время в миллисекундах: после вытеснения ключа
+    # из кэша версии не повторяются.
+    key = f'{relation_key(user_id, model)}:version'
+    cache.add(key, int(time.time() * 1000), None)
+    return key
+
+
+def user_relation_ids(user_id, model):
+    """Множество id объектов, связанных с пользователем через model."""
+
+    version = cache.get(version_key(user_id, model))
+    data_key = f'{relation_key(user_id, model)}:{version}'
+    ids = cache.get(data_key)
+    if ids is None:
+        ids = stored_relation_ids(user_id, model)
+        cache.set(data_key, ids, settings.USER_RELATIONS_CACHE_TIMEOUT)
+    return ids
+
+
+def stored_relation_ids(user_id, model):
+    return frozenset(model.objects.filter(user_id=user_id).values_list(
+        RELATED_FIELDS.get(model, 'recipe_id'), flat=True
+    ))
+
+
+def relation_ids(request, model):
+    """user_relation_ids текущего пользователя, пустое для анонима."""
+
+    user = getattr(request, 'user', None)
+    if user is None or user.is_anonymous:
+        return frozenset()
+    memo = request.__dict__.setdefault('_user_relations', {})
+    if model not in memo:
+        memo[model] = user_relation_ids(user.pk, model)
+    return memo[model]
+
+
+def changed(user_id, model):
+    """Отмечает изменение связей пользователя через model."""
+
+    transaction.on_commit(lambda: cache.incr(version_key(user_id, model)))
+
+
+def removed(relations):
+    """Связи relations будут удалены каскадом в БД, без сигналов."""
+
+    user_ids = list(
+        relations.order_by().values_list('user_id', flat=True).distinct()
+    )
+
+    def bump():
+        for user_id in user_ids:
+            cache.incr(version_key(user_id, relations.model))
+    if user_ids:
+        transaction.on_commit(bump)
+
+
+def settled_before():
+    """
+    Запись журнала не новее этого времени не обгонит запись с меньшим id.
+    """
+
+    return timezone.now() - timedelta(
+        seconds=settings.RELATION_CHANGES_SETTLE_TIME
+    )
+
+
+def full_state(request):
+    """
+    Полное состояние для клиента без действительного курсора.
+
+    Курсор берётся до чтения множеств, а множества читаются из БД, а не
+    из кэша: изменение, попавшее в ответ, но записанное после курсора,
+    клиент получит ещё раз при следующей синхронизации, и итог не
+    изменится. Пропустить изменение так нельзя.
+    """
+
+    cursor = RelationChange.objects.filter(
+        created_at__lte=settled_before()
+    ).order_by('-id').values_list('id', flat=True).first() or 0
+    return {
+        'cursor': cursor,
+        'reset': True,
+        'has_more': False,
+        **{
+            key: {
+                'added': sorted(
+                    stored_relation_ids(request.user.pk, model)
+                ),
+                'removed': [],
+            }
+            for model, key in SYNC_KEYS.items()
+        },
+    }
+
+
+def changes_since(request, cursor):
+    """
+    Добавленные и удалённые id после курсора (id записи журнала).
+
+    Для каждой связи берётся последнее изменение. Новый курсор — id
+    последней отданной записи старше RELATION_CHANGES_SETTLE_TIME,
+    более свежие записи повторятся в следующем ответе. Если курсора нет
+    или журнал до него уже очищен (prune_relation_changes), возвращается
+    полное состояние с reset=True.
+    """
+
+    oldest = RelationChange.objects.order_by('id').values_list(
+        'id', flat=True
+    ).first()
+    if not cursor or oldest is None or cursor < oldest - 1:
+        return full_state(request)
+    limit = settings.RELATION_CHANGES_PAGE_SIZE
+    entries = list(RelationChange.objects.filter(
+        user=request.user, id__gt=cursor
+    ).order_by('id').values_list(
+        'id', 'kind', 'object_id', 'added', 'created_at'
+    )[:limit + 1])
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    settled = settled_before()
+    next_cursor = max(
+        (entry[0] for entry in entries if entry[4] <= settled),
+        default=cursor
+    )
+    latest = {}
+    for _, kind, object_id, added, _ in entries:
+        latest[kind, object_id] = added
+    return {
+        'cursor': next_cursor,
+        'reset': False,
+        # Страница целиком из свежих записей: курсор не сдвинулся, и
+        # клиент продолжит после RELATION_CHANGES_SETTLE_TIME.
+        'has_more': has_more and next_cursor > cursor,
+        **{
+            key: {
+                'added': sorted(
+                    object_id for (kind, object_id), added in latest.items()
+                    if kind == model._meta.model_name and added
+                ),
+                'removed': sorted(
+                    object_id for (kind, object_id), added in latest.items()
+                    if kind == model._meta.model_name and not added
+                ),
+            }
+            for model, key in SYNC_KEYS.items()
+        },
+    }
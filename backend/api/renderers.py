@@ -0,0 +1,55 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Без orjson работаем на стандартном json.
+    orjson = None
+
+
+def _default(obj):
+    """Типы, которые orjson не умеет сам: Decimal, ленивые строки и т.д."""
+
+    return JSONEncoder().default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson.
+
+    orjson сразу отдаёт UTF-8 без экранирования кириллицы и заметно
+    быстрее стандартного json. Если библиотека не установлена или клиент
+    запросил отступы, используется стандартный JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(
+            data, default=_default, option=orjson.OPT_NON_STR_KEYS
+        )
+
+
+class FastJSONParser(JSONParser):
+    """JSON-парсер на orjson с откатом на стандартный JSONParser."""
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET
+        )
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
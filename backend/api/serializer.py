@@ -1,4 +1,7 @@
+from collections import Counter
+
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
 from drf_extra_fields.fields import Base64ImageField
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
@@ -9,6 +12,8 @@ from cookbook.models import (
     Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart, Subscription,
     Tag
 )
+from .fieldsets import SparseFieldsetsMixin
+from .relations import relation_ids
 
 User = get_user_model()
 
@@ -29,7 +34,7 @@ class IngredientSerializer(ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
-class UserReadSerializer(UserSerializer):
+class UserReadSerializer(SparseFieldsetsMixin, UserSerializer):
     """Сериализатор для модели User."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -40,13 +45,16 @@ class UserReadSerializer(UserSerializer):
         read_only_fields = fields
 
     def get_is_subscribed(self, author):
-        """Метод проверки подписки"""
-
-        user = self.context.get('request').user
-
-        return not user.is_anonymous and Subscription.objects.filter(
-            user=user, author=author
-        ).exists()
+        """
+        Метод проверки подписки: берёт аннотацию is_subscribed из
+        RecipeUserViewSet.get_queryset, если она есть.
+        """
+
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
+        return author.id in relation_ids(
+            self.context.get('request'), Subscription
+        )
 
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
@@ -64,7 +72,7 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Сериализатор для рецептов."""
 
     tags = TagSerializer(many=True)
@@ -83,13 +91,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def user_relation(self, recipe, model):
-        request = self.context['request']
-
-        return (
-            request is not None
-            and not request.user.is_anonymous
-            and model.objects.filter(user=request.user, recipe=recipe).exists()
-        )
+        return recipe.id in relation_ids(self.context['request'], model)
 
     def get_is_favorited(self, obj):
         """Метод проверки наличия в избранном."""
@@ -102,19 +104,75 @@ class RecipeSerializer(serializers.ModelSerializer):
         return self.user_relation(obj, ShoppingCart)
 
 
+def resolve_pks(queryset, pks, label):
+    """
+    Объекты queryset по списку id одним запросом, в порядке списка.
+
+    Все повторяющиеся и несуществующие id попадают в одну ошибку.
+    """
+
+    errors = []
+    duplicates = sorted(pk for pk, count in Counter(pks).items() if count > 1)
+    if duplicates:
+        errors.append(f'{label}: повторяются id {duplicates}.')
+    objects = queryset.in_bulk(set(pks))
+    missing = sorted(set(pks) - objects.keys())
+    if missing:
+        errors.append(f'{label}: не существуют id {missing}.')
+    if errors:
+        raise serializers.ValidationError(errors)
+    return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyListField(serializers.ListField):
+    """Список id, проверяемый одним запросом вместо запроса на элемент."""
+
+    child = serializers.IntegerField(min_value=1)
+
+    def __init__(self, queryset, verbose_name, **kwargs):
+        self.queryset = queryset
+        self.verbose_name = verbose_name
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        return resolve_pks(
+            self.queryset.all(), super().to_internal_value(data),
+            self.verbose_name
+        )
+
+
+class IngredientListSerializer(serializers.ListSerializer):
+    """Проверяет id всех продуктов рецепта одним запросом."""
+
+    def to_internal_value(self, data):
+        ingredients = super().to_internal_value(data)
+        objects = resolve_pks(
+            Ingredient.objects.all(),
+            [ingredient['id'] for ingredient in ingredients],
+            'Продукты'
+        )
+        return [
+            {**ingredient, 'id': obj}
+            for ingredient, obj in zip(ingredients, objects)
+        ]
+
+
 class IngredientWriteSerializer(serializers.Serializer):
     """Сериализатор для ингредиентов в рецептах"""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField(min_value=1)
     amount = serializers.IntegerField(min_value=MIN_INGREDIENTS_AMOUNT)
 
+    class Meta:
+        list_serializer_class = IngredientListSerializer
+
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     """Сериализатор для создания рецептов"""
 
     ingredients = IngredientWriteSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all()
+    tags = BulkPrimaryKeyListField(
+        queryset=Tag.objects.all(), verbose_name='Теги'
     )
     image = Base64ImageField(allow_null=True)
     cooking_time = serializers.IntegerField(min_value=MIN_COOKING_TIME)
@@ -127,8 +185,18 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                   'image', 'text', 'cooking_time')
 
     def to_representation(self, instance):
-        """Метод представления модели"""
-
+        """
+        Метод представления модели: рецепт перечитывается со связями,
+        чтобы ответ не делал запрос на каждый продукт.
+        """
+
+        instance = Recipe.objects.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
+        ).get(pk=instance.pk)
         return RecipeSerializer(instance, context=self.context).data
 
     def create_ingredients(self, recipe, ingredients):
@@ -155,7 +223,6 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags')
 
         recipe = super().create(validated_data)
-        recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
         self.create_tags(tags, recipe)
         return recipe
@@ -182,7 +249,19 @@ class RecipeProfileSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
-class UserRecipeSerializer(UserSerializer):
+def recipes_limit(request):
+    """Параметр ?recipes_limit= — неотрицательное целое или None."""
+
+    value = request.query_params.get('recipes_limit')
+    if value is None:
+        return None
+    try:
+        return serializers.IntegerField(min_value=0).run_validation(value)
+    except serializers.ValidationError as error:
+        raise serializers.ValidationError({'recipes_limit': error.detail})
+
+
+class UserRecipeSerializer(SparseFieldsetsMixin, UserSerializer):
     """Сериализатор для модели User, его подписок и рецептов."""
 
     recipes = serializers.SerializerMethodField()
@@ -196,22 +275,27 @@ class UserRecipeSerializer(UserSerializer):
         read_only_fields = fields
 
     def get_recipes(self, author):
-        """Метод для получения рецептов."""
+        """
+        Метод для получения рецептов: берёт limited_recipes из
+        RecipeUserViewSet.subscriptions, если они есть.
+        """
 
         request = self.context.get('request')
-        recipes = author.recipes.all()
-        recipes_limit = request.GET.get(
-            'recipes_limit', 10**10
-        )
+        if hasattr(author, 'limited_recipes'):
+            recipes = author.limited_recipes
+        else:
+            recipes = author.recipes.all()[:recipes_limit(request)]
 
         return RecipeProfileSerializer(
-            recipes[:int(recipes_limit)],
+            recipes,
             many=True,
             context={'request': request}
         ).data
 
     def get_recipes_count(self, user):
         """Метод для получения количества рецептов."""
+        if hasattr(user, 'recipes_count'):
+            return user.recipes_count
         return user.recipes.count()
 
 
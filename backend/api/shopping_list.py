@@ -0,0 +1,136 @@
+import time
+
+from django.core.cache import cache
+from django.db import models
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from cookbook.models import Recipe, RecipeIngredient
+from cookbook.units import base_unit, humanize, to_base
+
+STORAGE_DIR = 'shopping_lists'
+
+
+def cart_recipes(user):
+    return Recipe.objects.filter(shoppingcarts__user=user)
+
+
+def cart_ingredients(user):
+    """
+    Суммарное количество каждого продукта из рецептов в корзине.
+
+    Количества суммируются в базовых единицах одним запросом, так что
+    «г» и «кг» одного продукта попадают в одну строку.
+    """
+
+    return RecipeIngredient.objects.filter(
+        recipe__in=cart_recipes(user)
+    ).values(
+        'ingredient__name',
+        measurement_unit=base_unit('ingredient__measurement_unit')
+    ).annotate(
+        total_amount=models.Sum(
+            to_base('amount', 'ingredient__measurement_unit')
+        )
+    ).order_by('ingredient__name', 'measurement_unit')
+
+
+def humanize_row(data):
+    """Строка cart_ingredients в удобных для чтения единицах."""
+
+    total_amount, measurement_unit = humanize(
+        data['total_amount'], data['measurement_unit']
+    )
+    return {
+        **data,
+        'total_amount': total_amount,
+        'measurement_unit': measurement_unit,
+    }
+
+
+def cart_version_key(user_id):
+    return f'shopping-cart-version:{user_id}'
+
+
+def cart_version(user_id):
+    """
+    Версия корзины пользователя, растёт при каждом её изменении.
+
+    Начальное значение — время в миллисекундах, чтобы после потери ключа
+    в кэше версии не повторялись.
+    """
+
+    key = cart_version_key(user_id)
+    cache.add(key, int(time.time() * 1000), None)
+    return cache.get(key)
+
+
+def bump_cart_version(user_id):
+    key = cart_version_key(user_id)
+    cache.add(key, int(time.time() * 1000), None)
+    return cache.incr(key)
+
+
+def user_dir(user_id):
+    """Каталог готовых списков покупок пользователя в хранилище."""
+
+    return f'{STORAGE_DIR}/{user_id}'
+
+
+def stored_name(user_id, version):
+    """
+    Путь в хранилище к готовому списку покупок для версии корзины.
+
+    Файлы отдаются nginx из /media/, поэтому имя содержит подпись,
+    которую нельзя подобрать по id пользователя и версии.
+    """
+
+    signature = salted_hmac(
+        'shopping-list', f'{user_id}:{version}', algorithm='sha256'
+    ).hexdigest()[:20]
+    return f'{user_dir(user_id)}/{version}_{signature}.html'
+
+
+def file_name(user):
+    current_time = timezone.now().strftime('%Y%m%d_%H%M%S')
+    return f'shopping_list_{user.id}_{current_time}.html'
+
+
+def render_shopping_list(recipes, ingredients):
+    return render_to_string(
+        'shopping_list_template.html',
+        {
+            'recipes': recipes,
+            'total_ingredients': [humanize_row(data) for data in ingredients],
+            'date': timezone.now().strftime('%d.%m.%Y')
+        }
+    )
+
+
+async def astream_shopping_list(recipes, ingredients):
+    """
+    Отдаёт список покупок по частям, пока строки читаются из БД.
+
+    recipes — список рецептов, ingredients — queryset cart_ingredients.
+    """
+
+    rows = aiter(ingredients)
+    first = await anext(rows, None)
+    context = {
+        'recipes': recipes,
+        'has_ingredients': first is not None,
+        'recipes_count': len(recipes),
+        'date': timezone.now().strftime('%d.%m.%Y'),
+    }
+    yield render_to_string('shopping_list/header.html', context)
+    number = 0
+    data = first
+    while data is not None:
+        number += 1
+        yield render_to_string(
+            'shopping_list/row.html',
+            {'number': number, 'data': humanize_row(data)}
+        )
+        data = await anext(rows, None)
+    yield render_to_string('shopping_list/footer.html', context)
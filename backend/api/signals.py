@@ -0,0 +1,160 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from cookbook.models import (Favorite, Ingredient, Recipe,
+                             RecipeSimilarity, ShoppingCart, Subscription,
+                             Tag)
+from cookbook.signals import recipes_changed
+from . import authentication, pantry, recipe_cards, relations
+from .tasks import (rebuild_ingredient_catalog, refresh_recipe_cards,
+                    refresh_shopping_lists, schedule_cart_lists,
+                    schedule_shopping_list, schedule_similar_recipes)
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def schedule_ingredient_catalog(sender, **kwargs):
+    """Ставит пересборку каталога продуктов в фоновую очередь."""
+
+    if settings.INGREDIENT_CATALOG:
+        rebuild_ingredient_catalog.delay(
+            idempotency_key='ingredient-catalog'
+        )
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    """Выход через djoser удаляет токен — сбрасываем его из кэша."""
+
+    authentication.forget(instance.key)
+
+
+@receiver((post_save, post_delete), sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    """Изменённый или отключённый пользователь перечитывается из БД."""
+
+    authentication.forget(*Token.objects.filter(
+        user_id=instance.pk
+    ).values_list('key', flat=True))
+
+
+@receiver(recipes_changed)
+def refresh_changed_cards(sender, recipe_ids, **kwargs):
+    """Рецепт сохранён в админке вместе с продуктами."""
+
+    recipe_cards.refresh(recipe_ids)
+    pantry.changed(recipe_ids)
+    schedule_similar_recipes(recipe_ids)
+    refresh_shopping_lists.delay(id__in=list(recipe_ids))
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def schedule_cart_shopping_list(sender, instance, **kwargs):
+    """Корзина изменена через API или админку."""
+
+    if kwargs.get('created') is not False:
+        schedule_shopping_list(instance.user_id)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Subscription)
+def bump_relations_version(sender, instance, **kwargs):
+    """Связь добавлена или удалена через API или админку."""
+
+    if kwargs.get('created') is not False:
+        relations.changed(instance.user_id, sender)
+
+
+def forget_recipes(recipes):
+    """
+    Рецепты recipes удаляются вместе со связями каскадом в БД: соседи,
+    корзины и избранное читаются до удаления, а индексы, списки покупок
+    и версии множеств связей обновляются после фиксации.
+    """
+
+    recipe_ids = list(recipes.values_list('id', flat=True))
+    if not recipe_ids:
+        return
+    similar_to = list(RecipeSimilarity.objects.filter(
+        similar__in=recipes
+    ).exclude(recipe__in=recipes).values_list(
+        'recipe_id', flat=True
+    ).distinct())
+    schedule_cart_lists(ShoppingCart.objects.filter(recipe__in=recipes))
+    for model in (Favorite, ShoppingCart):
+        relations.removed(model.objects.filter(recipe__in=recipes))
+    pantry.changed(recipe_ids)
+    schedule_similar_recipes(similar_to)
+
+
+@receiver(pre_delete, sender=Recipe)
+def forget_deleted_recipe(sender, instance, **kwargs):
+    """Удаление через API и админку."""
+
+    forget_recipes(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_delete, sender=User)
+def forget_deleted_author(sender, instance, **kwargs):
+    """Рецепты автора и подписки на него удалятся каскадом в БД."""
+
+    forget_recipes(Recipe.objects.filter(author=instance))
+    relations.removed(Subscription.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=User)
+def refresh_author_cards(sender, instance, created, update_fields,
+                         **kwargs):
+    # Вход в админку обновляет только last_login, его в карточке нет.
+    if not created and update_fields != {'last_login'}:
+        refresh_recipe_cards.delay(
+            author_id=instance.pk,
+            idempotency_key=f'recipe-cards:author:{instance.pk}'
+        )
+
+
+@receiver(post_save, sender=Tag)
+def refresh_tag_cards(sender, instance, created, **kwargs):
+    if not created:
+        refresh_recipe_cards.delay(
+            tags=instance.pk,
+            idempotency_key=f'recipe-cards:tag:{instance.pk}'
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_cards(sender, instance, created, **kwargs):
+    if not created:
+        refresh_recipe_cards.delay(
+            ingredients=instance.pk,
+            idempotency_key=f'recipe-cards:ingredient:{instance.pk}'
+        )
+        refresh_shopping_lists.delay(
+            ingredients=instance.pk,
+            idempotency_key=f'shopping-lists:ingredient:{instance.pk}'
+        )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def refresh_cards_before_delete(sender, instance, **kwargs):
+    """
+    Связи с рецептами удаляются каскадом без сигналов, поэтому рецепты
+    для пересборки карточек запоминаются до удаления.
+    """
+
+    field = 'tags' if sender is Tag else 'ingredients'
+    recipe_ids = list(Recipe.objects.filter(
+        **{field: instance}
+    ).values_list('id', flat=True))
+    if recipe_ids:
+        refresh_recipe_cards.delay(id__in=recipe_ids)
+        if sender is Ingredient:
+            pantry.changed(recipe_ids)
+            schedule_similar_recipes(recipe_ids)
+            refresh_shopping_lists.delay(id__in=recipe_ids)
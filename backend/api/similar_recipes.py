@@ -0,0 +1,159 @@
+"""
+Похожие рецепты.
+
+Сходство двух рецептов — взвешенная сумма коэффициентов Жаккара по
+продуктам и по тегам (вес тегов SIMILAR_RECIPES_TAG_WEIGHT). Кандидаты —
+рецепты с общими продуктами из инвертированного индекса поиска по
+продуктам (api/pantry.py); продукты, которые есть больше чем в
+SIMILAR_RECIPES_MAX_POSTING рецептах (соль, вода), кандидатов не
+добавляют, но учитываются в оценке.
+
+Для каждого рецепта хранятся SIMILAR_RECIPES_COUNT лучших соседей
+(cookbook.RecipeSimilarity), так что /api/recipes/{id}/similar/ читает
+готовый список по индексу. Списки пересчитывает фоновая задача при
+изменении рецептов (refresh), полностью — команда build_similar_recipes.
+"""
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+
+from cookbook.models import Recipe, RecipeSimilarity
+from .pantry import index
+
+
+def recipe_tags(recipe_ids=None):
+    """id рецепта -> множество id тегов; без recipe_ids — все рецепты."""
+
+    rows = Recipe.tags.through.objects.order_by()
+    if recipe_ids is not None:
+        rows = rows.filter(recipe_id__in=recipe_ids)
+    tags = defaultdict(frozenset)
+    for recipe_id, tag_id in rows.values_list('recipe_id', 'tag_id'):
+        tags[recipe_id] |= {tag_id}
+    return tags
+
+
+def jaccard(first, second):
+    union = len(first | second)
+    return len(first & second) / union if union else 0.0
+
+
+def candidates(recipe_id):
+    """Рецепты с общими продуктами, кроме слишком частых продуктов."""
+
+    found = set()
+    for ingredient_id in index.recipes.get(recipe_id, ()):
+        recipe_ids = index.postings.get(ingredient_id, ())
+        if len(recipe_ids) <= settings.SIMILAR_RECIPES_MAX_POSTING:
+            found.update(recipe_ids)
+    found.discard(recipe_id)
+    return found
+
+
+def similarity(recipe_ids, tags=None):
+    """
+    id рецепта -> {id кандидата: сходство} для рецептов recipe_ids.
+
+    Теги кандидатов читаются одним запросом, если не переданы готовые.
+    """
+
+    found = {recipe_id: candidates(recipe_id) for recipe_id in recipe_ids}
+    if tags is None:
+        tags = recipe_tags(set(found).union(*found.values()))
+    weight = settings.SIMILAR_RECIPES_TAG_WEIGHT
+    scores = {}
+    for recipe_id, recipe_candidates in found.items():
+        ingredients = frozenset(index.recipes.get(recipe_id, ()))
+        scores[recipe_id] = {
+            candidate: (1 - weight) * jaccard(
+                ingredients, frozenset(index.recipes.get(candidate, ()))
+            ) + weight * jaccard(tags[recipe_id], tags[candidate])
+            for candidate in recipe_candidates
+        }
+    return scores
+
+
+def top(scores):
+    """Лучшие соседи: [(id рецепта, сходство)] по убыванию сходства."""
+
+    return heapq.nlargest(
+        settings.SIMILAR_RECIPES_COUNT, scores.items(),
+        key=lambda item: (item[1], -item[0])
+    )
+
+
+def save(neighbours):
+    """Заменяет списки соседей рецептов из neighbours."""
+
+    with transaction.atomic():
+        RecipeSimilarity.objects.filter(recipe_id__in=neighbours).delete()
+        RecipeSimilarity.objects.bulk_create(
+            RecipeSimilarity(
+                recipe_id=recipe_id, similar_id=similar_id, score=score
+            )
+            for recipe_id, items in neighbours.items()
+            if recipe_id in index.recipes
+            for similar_id, score in items
+        )
+
+
+def rebuild(batch_size):
+    """Пересчитывает соседей всех рецептов; возвращает число рецептов."""
+
+    index.sync()
+    tags = recipe_tags()
+    recipe_ids = sorted(index.recipes)
+    for start in range(0, len(recipe_ids), batch_size):
+        save({
+            recipe_id: top(scores)
+            for recipe_id, scores in similarity(
+                recipe_ids[start:start + batch_size], tags
+            ).items()
+        })
+    return len(recipe_ids)
+
+
+def refresh(recipe_ids):
+    """
+    Пересчитывает соседей изменённых рецептов и чужие списки, из которых
+    они могли выпасть или в которые теперь должны войти.
+
+    Сходство симметрично, поэтому рецепт входит в список кандидата, если
+    сходство с ним выше худшего соседа кандидата или список неполон.
+    """
+
+    index.sync()
+    recipe_ids = set(recipe_ids)
+    scores = similarity(recipe_ids)
+    affected = set(RecipeSimilarity.objects.filter(
+        similar_id__in=recipe_ids
+    ).values_list('recipe_id', flat=True))
+    best = defaultdict(float)
+    for recipe_scores in scores.values():
+        for candidate, score in recipe_scores.items():
+            best[candidate] = max(best[candidate], score)
+    lists = {
+        row['recipe_id']: row for row in RecipeSimilarity.objects.filter(
+            recipe_id__in=best
+        ).values('recipe_id').annotate(
+            count=Count('id'), lowest=Min('score')
+        ).order_by()
+    }
+    for candidate, score in best.items():
+        row = lists.get(candidate)
+        if (row is None or row['count'] < settings.SIMILAR_RECIPES_COUNT
+                or score > row['lowest']):
+            affected.add(candidate)
+    affected -= recipe_ids
+    neighbours = {
+        recipe_id: top(recipe_scores)
+        for recipe_id, recipe_scores in scores.items()
+    }
+    neighbours.update(
+        (recipe_id, top(recipe_scores))
+        for recipe_id, recipe_scores in similarity(affected).items()
+    )
+    save(neighbours)
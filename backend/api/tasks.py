@@ -0,0 +1,112 @@
+"""Фоновые задачи API (см. taskqueue)."""
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from cookbook.models import Recipe, ShoppingCart
+from taskqueue.queue import task
+from . import recipe_cards, similar_recipes
+from .catalog import write_catalog
+from .shopping_list import (bump_cart_version, cart_ingredients, cart_recipes,
+                            cart_version, render_shopping_list, stored_name,
+                            user_dir)
+
+User = get_user_model()
+
+
+@task()
+def build_shopping_list(user_id):
+    """Заранее собирает файл списка покупок для текущей версии корзины."""
+
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    # Версия читается до данных: файл не старее версии в своём имени.
+    name = stored_name(user_id, cart_version(user_id))
+    if default_storage.exists(name):
+        return
+    default_storage.save(name, ContentFile(
+        render_shopping_list(
+            cart_recipes(user), cart_ingredients(user)
+        ).encode()
+    ))
+    # Файлы прежних версий корзины лежат в каталоге пользователя.
+    directory = user_dir(user_id)
+    _, files = default_storage.listdir(directory)
+    for old_name in files:
+        path = f'{directory}/{old_name}'
+        if path != name:
+            default_storage.delete(path)
+
+
+def schedule_shopping_list(user_id):
+    """
+    Отмечает изменение корзины и ставит пересборку списка покупок после
+    фиксации транзакции: до неё сборка прочитала бы старые данные под
+    новой версией.
+    """
+
+    def schedule():
+        bump_cart_version(user_id)
+        build_shopping_list.delay(
+            user_id, idempotency_key=f'shopping-list:{user_id}'
+        )
+    transaction.on_commit(schedule)
+
+
+def schedule_cart_lists(carts):
+    """Пересобирает списки покупок владельцев корзин carts."""
+
+    for user_id in carts.order_by().values_list(
+        'user_id', flat=True
+    ).distinct():
+        schedule_shopping_list(user_id)
+
+
+@task()
+def refresh_recipe(recipe_id):
+    """Пересчитывает данные, зависящие от состава рецепта."""
+
+    schedule_cart_lists(ShoppingCart.objects.filter(recipe_id=recipe_id))
+
+
+@task()
+def refresh_shopping_lists(**filters):
+    """Пересобирает списки покупок корзин с рецептами по фильтрам Recipe."""
+
+    schedule_cart_lists(ShoppingCart.objects.filter(
+        recipe__in=Recipe.objects.filter(**filters)
+    ))
+
+
+@task()
+def rebuild_ingredient_catalog():
+    write_catalog()
+
+
+@task()
+def refresh_recipe_cards(**filters):
+    """Пересобирает карточки рецептов, отобранных фильтрами Recipe."""
+
+    recipe_cards.refresh(Recipe.objects.filter(**filters).values_list(
+        'id', flat=True
+    ))
+
+
+@task()
+def refresh_similar_recipes(recipe_ids):
+    """Пересчитывает списки похожих рецептов после изменения рецептов."""
+
+    similar_recipes.refresh(recipe_ids)
+
+
+def schedule_similar_recipes(recipe_ids):
+    recipe_ids = sorted(recipe_ids)
+    if len(recipe_ids) == 1:
+        refresh_similar_recipes.delay(
+            recipe_ids,
+            idempotency_key=f'similar-recipes:{recipe_ids[0]}'
+        )
+    elif recipe_ids:
+        refresh_similar_recipes.delay(recipe_ids)
@@ -0,0 +1,345 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api import recipe_cards
+from api.plain_serializers import (serialize_ingredients, serialize_recipes,
+                                   serialize_tags)
+from api.serializer import (IngredientSerializer, RecipeSerializer,
+                            TagSerializer)
+from cookbook.models import (Favorite, Ingredient, Recipe, RecipeCard,
+                             RecipeIngredient, RelationChange, ShoppingCart,
+                             Subscription, Tag)
+
+User = get_user_model()
+
+QUERIES = (
+    '',
+    'fields=id,name,author.username',
+    'fields=tags,ingredients,is_favorited,is_in_shopping_cart',
+    'fields=author.id,author.is_subscribed',
+    'omit=text,author.avatar,author.email',
+    'fields=author,ingredients&omit=author.is_subscribed',
+)
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class PlainSerializersTests(TestCase):
+    """
+    Быстрые сериализаторы (api/plain_serializers.py) отдают побайтно тот
+    же JSON, что и ModelSerializer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Первый'
+        )
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Второй', avatar='users/author.png'
+        )
+        tags = Tag.objects.bulk_create([
+            Tag(name='Ужин', slug='dinner'),
+            Tag(name='Завтрак', slug='breakfast'),
+        ])
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name='Соль', measurement_unit='г'),
+            Ingredient(name='Мука', measurement_unit='г'),
+            Ingredient(name='Молоко', measurement_unit='мл'),
+        ])
+        recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                image=f'recipes/images/{number}.png', cooking_time=number
+            )
+            for number, author in enumerate(
+                (cls.author, cls.author, cls.user), start=1
+            )
+        ]
+        for number, recipe in enumerate(recipes):
+            recipe.tags.set(tags[:number + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient,
+                    amount=10 * (number + 1)
+                )
+                for ingredient in ingredients[number:]
+            )
+        Favorite.objects.create(user=cls.user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=recipes[1])
+        Subscription.objects.create(user=cls.user, author=cls.author)
+        cls.recipe_ids = [recipe.id for recipe in recipes]
+
+    def setUp(self):
+        # Множества связей пользователей живут в кэше между тестами.
+        cache.clear()
+
+    def make_request(self, query, user):
+        request = Request(APIRequestFactory().get(f'/api/recipes/?{query}'))
+        request.user = user
+        return request
+
+    def expected_recipes(self, request):
+        recipes = Recipe.objects.filter(
+            id__in=self.recipe_ids
+        ).select_related('author').prefetch_related(
+            'tags', 'recipe_ingredients__ingredient'
+        ).in_bulk()
+        return render(RecipeSerializer(
+            [recipes[recipe_id] for recipe_id in self.recipe_ids],
+            many=True, context={'request': request}
+        ).data)
+
+    def assertRecipesMatch(self, new_cards):
+        for query in QUERIES:
+            for user in (AnonymousUser(), self.user):
+                with self.subTest(query=query, user=user):
+                    if new_cards:
+                        RecipeCard.objects.all().delete()
+                    request = self.make_request(query, user)
+                    self.assertEqual(
+                        render(serialize_recipes(self.recipe_ids, request)),
+                        self.expected_recipes(request)
+                    )
+
+    def test_tags(self):
+        self.assertEqual(
+            render(serialize_tags(Tag.objects.all())),
+            render(TagSerializer(Tag.objects.all(), many=True).data)
+        )
+
+    def test_ingredients(self):
+        self.assertEqual(
+            render(serialize_ingredients(Ingredient.objects.all())),
+            render(IngredientSerializer(
+                Ingredient.objects.all(), many=True
+            ).data)
+        )
+
+    def test_recipes_from_new_cards(self):
+        """Карточки собираются на лету при первом чтении."""
+
+        self.assertRecipesMatch(new_cards=True)
+
+    def test_recipes_from_stored_cards(self):
+        """Карточки читаются из БД (в PostgreSQL — jsonb)."""
+
+        recipe_cards.refresh(self.recipe_ids)
+        self.assertRecipesMatch(new_cards=False)
+
+
+@override_settings(RELATION_CHANGES_SETTLE_TIME=60)
+class RelationChangesTests(TestCase):
+    """Синхронизация связей по журналу RelationChange (/users/me/changes/)."""
+
+    url = '/api/users/me/changes/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def log(self, object_id, added=True, age=0, **kwargs):
+        """Запись журнала, созданная age секунд назад."""
+
+        change = RelationChange.objects.create(
+            user=self.user, kind='favorite', object_id=object_id,
+            added=added, **kwargs
+        )
+        RelationChange.objects.filter(pk=change.pk).update(
+            created_at=timezone.now() - timedelta(seconds=age)
+        )
+        return change
+
+    def sync(self, cursor):
+        response = self.client.get(self.url, {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_settled_changes_advance_cursor(self):
+        start = self.log(1, age=600).id
+        last = self.log(2, age=120).id
+        data = self.sync(start)
+        self.assertEqual(data['cursor'], last)
+        self.assertEqual(data['favorites']['added'], [2])
+        self.assertEqual(self.sync(last)['favorites']['added'], [])
+
+    def test_out_of_order_commit(self):
+        """
+        Запись с меньшим id, зафиксированная позже записи с большим id,
+        не теряется: курсор не проходит свежие записи.
+        """
+
+        start = self.log(1, age=600).id
+        later = self.log(3, id=start + 10).id
+        data = self.sync(start)
+        self.assertEqual(data['favorites']['added'], [3])
+        self.assertEqual(data['cursor'], start)
+        # Долгая транзакция фиксирует запись, вставленную раньше.
+        self.log(2, id=start + 5, age=30)
+        data = self.sync(data['cursor'])
+        self.assertEqual(data['favorites']['added'], [2, 3])
+        RelationChange.objects.filter(pk__gt=start).update(
+            created_at=timezone.now() - timedelta(seconds=120)
+        )
+        data = self.sync(data['cursor'])
+        self.assertEqual(data['cursor'], later)
+        self.assertEqual(data['favorites']['added'], [2, 3])
+
+    def test_repeated_changes_keep_latest_state(self):
+        start = self.log(1, age=600).id
+        self.log(2)
+        self.log(2, added=False)
+        data = self.sync(start)
+        self.assertEqual(data['favorites'], {'added': [], 'removed': [2]})
+        self.assertEqual(self.sync(data['cursor']), data)
+
+    def test_full_state_cursor_is_settled(self):
+        settled = self.log(1, age=600).id
+        self.log(2)
+        data = self.sync('')
+        self.assertTrue(data['reset'])
+        self.assertEqual(data['cursor'], settled)
+
+
+class SubscriptionsTests(TestCase):
+    """Список подписок с рецептами авторов (/users/subscriptions/)."""
+
+    url = '/api/users/subscriptions/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com'
+        )
+        author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                image=f'recipes/images/{number}.png', cooking_time=number
+            )
+            for number in range(1, 4)
+        )
+        Subscription.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_recipes_limit(self):
+        for limit, count in (('2', 2), ('0', 0), ('10', 3)):
+            with self.subTest(limit=limit):
+                response = self.client.get(
+                    self.url, {'recipes_limit': limit}
+                )
+                self.assertEqual(response.status_code, 200)
+                (author,) = response.json()['results']
+                self.assertEqual(len(author['recipes']), count)
+                self.assertEqual(author['recipes_count'], 3)
+
+    def test_invalid_recipes_limit(self):
+        for limit in ('abc', '-1', '1.5', ''):
+            with self.subTest(limit=limit):
+                response = self.client.get(
+                    self.url, {'recipes_limit': limit}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('recipes_limit', response.json())
+
+
+class RecipeQueriesTests(TestCase):
+    """Число запросов списка и рецепта не зависит от размера страницы."""
+
+    # Счётчик, id страницы и карточки.
+    LIST_QUERIES = 3
+    # Проверка существования рецепта и карточка.
+    RETRIEVE_QUERIES = 2
+    # Сборка недостающих карточек: рецепты, теги, продукты и авторы
+    # в точке сохранения и вставка карточек одним запросом.
+    CARD_QUERIES = 7
+    # Множества избранного, корзины и подписок пользователя вне кэша.
+    RELATION_QUERIES = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com'
+        )
+        tag = Tag.objects.create(name='Ужин', slug='dinner')
+        ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=cls.user, name=f'Рецепт {number}', text='Описание',
+                image=f'recipes/images/{number}.png', cooking_time=number
+            )
+            for number in range(1, 13)
+        )
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes
+        )
+        cls.recipe_id = recipes[0].id
+
+    def setUp(self):
+        cache.clear()
+        RecipeCard.objects.all().delete()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, client, url, params=None):
+        response = client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_list_queries(self):
+        for limit in (2, 10):
+            with self.subTest(limit=limit):
+                cache.clear()
+                RecipeCard.objects.all().delete()
+                params = {'limit': limit}
+                with self.assertNumQueries(
+                    self.LIST_QUERIES + self.CARD_QUERIES
+                    + self.RELATION_QUERIES
+                ):
+                    data = self.get(self.client, '/api/recipes/', params)
+                self.assertEqual(len(data['results']), limit)
+                with self.assertNumQueries(self.LIST_QUERIES):
+                    self.get(self.client, '/api/recipes/', params)
+                with self.assertNumQueries(self.LIST_QUERIES):
+                    self.get(self.anonymous, '/api/recipes/', params)
+
+    def test_retrieve_queries(self):
+        url = f'/api/recipes/{self.recipe_id}/'
+        with self.assertNumQueries(
+            self.RETRIEVE_QUERIES + self.CARD_QUERIES
+            + self.RELATION_QUERIES
+        ):
+            self.get(self.client, url)
+        with self.assertNumQueries(self.RETRIEVE_QUERIES):
+            self.get(self.client, url)
+        with self.assertNumQueries(self.RETRIEVE_QUERIES):
+            self.get(self.anonymous, url)
@@ -0,0 +1,119 @@
+"""
+Ограничение частоты запросов к тяжёлым изменяющим эндпоинтам.
+
+Лимиты задаются по областям (throttle_scope у action'а) в
+REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']: '<область>' — на пользователя,
+'<область>_ip' — на адрес клиента. Счётчики скользящего окна хранятся в
+общем кэше (Redis), поэтому лимиты действуют сразу для всех воркеров; без
+REDIS_URL используется кэш в памяти процесса.
+"""
+import logging
+
+from rest_framework.throttling import ScopedRateThrottle
+
+logger = logging.getLogger(__name__)
+
+REJECTED_KEY = 'throttle-rejected:{scope}'
+
+
+class SlidingWindowThrottle(ScopedRateThrottle):
+    """
+    Скользящее окно из двух соседних фиксированных окон.
+
+    Запросы текущего окна считаются атомарным incr в кэше, запросы
+    предыдущего — с весом оставшейся доли окна. В отличие от
+    SimpleRateThrottle, не хранит список времён запросов и не теряет
+    обновления при одновременных запросах из разных воркеров.
+    """
+
+    def get_scope(self, view):
+        return getattr(view, self.scope_attr, None)
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        if not scope or scope not in self.THROTTLE_RATES:
+            return True
+        self.scope = scope
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        now = self.timer()
+        window = int(now // self.duration)
+        self.elapsed = now - window * self.duration
+        current_key = f'{self.key}:{window}'
+        self.cache.add(current_key, 0, self.duration * 2)
+        self.current = self.cache.incr(current_key)
+        self.previous = self.cache.get(f'{self.key}:{window - 1}', 0)
+        weight = 1 - self.elapsed / self.duration
+        if self.previous * weight + self.current <= self.num_requests:
+            return True
+        return self.throttle_failure()
+
+    def throttle_failure(self):
+        rejected_key = REJECTED_KEY.format(scope=self.scope)
+        self.cache.add(rejected_key, 0, None)
+        self.cache.incr(rejected_key)
+        logger.warning('Превышен лимит %s: %s', self.rate, self.key)
+        return False
+
+    def wait(self):
+        if self.current > self.num_requests:
+            return self.duration - self.elapsed
+        # Ждём, пока вес предыдущего окна не опустится до свободного места.
+        free = self.num_requests - self.current
+        return max(
+            self.duration * (1 - free / self.previous) - self.elapsed, 0
+        )
+
+
+class UserActionThrottle(SlidingWindowThrottle):
+    """Лимит области на пользователя (для анонимов — на адрес)."""
+
+
+class IPActionThrottle(SlidingWindowThrottle):
+    """Лимит области '<область>_ip' на адрес клиента."""
+
+    def get_scope(self, view):
+        scope = super().get_scope(view)
+        return f'{scope}_ip' if scope else None
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope, 'ident': self.get_ident(request)
+        }
+
+
+class ThrottleScope:
+    """Заглушка вьюхи для проверки лимитов вне DRF (async-вьюхи)."""
+
+    def __init__(self, scope):
+        self.throttle_scope = scope
+
+
+def throttle_wait(request, scope):
+    """
+    Проверяет лимиты области для обычной вьюхи Django.
+
+    Возвращает время ожидания в секундах или None, если запрос разрешён.
+    У request должен быть установлен user.
+    """
+
+    view = ThrottleScope(scope)
+    waits = [
+        throttle.wait()
+        for throttle in (UserActionThrottle(), IPActionThrottle())
+        if not throttle.allow_request(request, view)
+    ]
+    return max(waits) if waits else None
+
+
+def rejected_counts(scopes):
+    """Число отклонённых запросов по областям с момента запуска кэша."""
+
+    cache = SlidingWindowThrottle.cache
+    return {
+        scope: cache.get(REJECTED_KEY.format(scope=scope), 0)
+        for scope in scopes
+    }
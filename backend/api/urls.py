@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .views import (IngredientViewSet, RecipeUserViewSet, RecipeViewSet,
                     TagViewSet)
 
@@ -13,7 +15,18 @@ router.register('users', RecipeUserViewSet, basename='users')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 
+# Async-версии перекрывают action'ы вьюсетов с теми же адресами.
+async_urlpatterns = [
+    path(
+        'recipes/download_shopping_cart/',
+        async_views.download_shopping_cart,
+        name='download-shopping-cart'
+    ),
+    path('users/me/avatar/', async_views.avatar, name='user-avatar'),
+]
+
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),  # Работа с токенами
+    *(async_urlpatterns if settings.ASYNC_VIEWS else []),
     path('', include(router.urls)),
 ]
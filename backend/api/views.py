@@ -1,10 +1,12 @@
+import io
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.http import FileResponse
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.http import FileResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404
-from django.template.loader import render_to_string
 from django.urls import reverse
-from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import filters, status
@@ -14,15 +16,26 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from cookbook.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+from cookbook import short_links
+from cookbook.models import (Favorite, Ingredient, Recipe, RecipeSimilarity,
                              ShoppingCart, Subscription, Tag)
+from .catalog import catalog_response
+from .fieldsets import selected_fields
 from .filters import IngredientFilter, RecipeFilter
 from .pagination import UsersPagination
 from .permissions import IsAuthorOrReadOnly
+from . import pantry, recipe_cards, relations
+from .plain_serializers import (serialize_ingredients, serialize_recipes,
+                                serialize_tags)
 from .serializer import (AvatarSerializer, IngredientSerializer,
                          RecipeProfileSerializer, RecipeSerializer,
                          RecipeWriteSerializer, TagSerializer,
-                         UserReadSerializer, UserRecipeSerializer)
+                         UserReadSerializer, UserRecipeSerializer,
+                         recipes_limit)
+from .shopping_list import (cart_ingredients, cart_recipes, cart_version,
+                            file_name, render_shopping_list, stored_name)
+from .tasks import (build_shopping_list, refresh_recipe,
+                    schedule_similar_recipes)
 
 User = get_user_model()
 
@@ -34,23 +47,60 @@ class RecipeUserViewSet(UserViewSet):
     serializer_class = UserReadSerializer
     pagination_class = UsersPagination
     permission_classes = (IsAuthorOrReadOnly,)
+    throttle_scope = None
+
+    def get_queryset(self):
+        """
+        Подписка на каждого пользователя вычисляется в том же запросе
+        через EXISTS, читаются только выводимые поля.
+        """
+
+        users = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return users
+        fields = selected_fields(self.request, UserReadSerializer.Meta.fields)
+        user = self.request.user
+        if 'is_subscribed' in fields and not user.is_anonymous:
+            users = users.annotate(is_subscribed=models.Exists(
+                Subscription.objects.filter(
+                    user=user, author=models.OuterRef('pk')
+                )
+            ))
+        return users.only(*(
+            name for name in fields if name != 'is_subscribed'
+        ))
 
     @action(
         detail=False, methods=['get'], url_path='subscriptions',
         permission_classes=[IsAuthenticated],
     )
     def subscriptions(self, request):
+        fields = selected_fields(request, UserRecipeSerializer.Meta.fields)
+        limit = recipes_limit(request)
+        authors = User.objects.filter(authors__user=request.user)
+        if 'recipes_count' in fields:
+            authors = authors.annotate(recipes_count=models.Count('recipes'))
+        if 'recipes' in fields:
+            recipes = Recipe.objects.only(
+                'id', 'name', 'image', 'cooking_time', 'author_id'
+            )
+            if limit is not None:
+                recipes = recipes[:limit]
+            authors = authors.prefetch_related(
+                # Срез в Prefetch работает только с to_attr.
+                models.Prefetch(
+                    'recipes', queryset=recipes, to_attr='limited_recipes'
+                )
+            )
         return self.get_paginated_response(UserRecipeSerializer(
-            self.paginate_queryset(
-                User.objects.filter(authors__user=request.user)
-            ),
+            self.paginate_queryset(authors),
             context={'request': request},
             many=True
         ).data)
 
     @action(
         detail=True, methods=['post', 'delete'], url_path='subscribe',
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,), throttle_scope='subscribe'
     )
     def subscribe(self, request, *args, **kwargs):
         author_id = self.kwargs['id']
@@ -80,6 +130,25 @@ class RecipeUserViewSet(UserViewSet):
             status=status.HTTP_201_CREATED
         )
 
+    @action(
+        detail=False, methods=['get'], url_path='me/changes',
+        permission_classes=(IsAuthenticated,)
+    )
+    def changes(self, request, *args, **kwargs):
+        """
+        Изменения избранного, корзины и подписок после ?cursor=.
+
+        Клиент сохраняет cursor из ответа и передаёт его в следующем
+        запросе; при reset=True состояние нужно заменить целиком.
+        Изменения последних RELATION_CHANGES_SETTLE_TIME секунд могут
+        повториться в следующем ответе.
+        """
+
+        cursor = request.query_params.get('cursor', '')
+        return Response(relations.changes_since(
+            request, int(cursor) if cursor.isdigit() else None
+        ))
+
     @action(
         detail=False, methods=['put', 'delete'], url_path='me/avatar',
         permission_classes=(IsAuthenticated,)
@@ -112,6 +181,11 @@ class TagViewSet(ReadOnlyModelViewSet):
     search_fields = ('name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return Response(
+            serialize_tags(self.filter_queryset(self.get_queryset()))
+        )
+
 
 class RecipeViewSet(ModelViewSet):
     """Вьюсет для операций с рецептами."""
@@ -121,16 +195,55 @@ class RecipeViewSet(ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     pagination_class = UsersPagination
+    throttle_scope = None
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return RecipeSerializer
         return RecipeWriteSerializer
 
+    def get_queryset(self):
+        recipes = super().get_queryset()
+        if self.action == 'retrieve':
+            # Данные рецепта берутся из карточки, здесь нужна только
+            # проверка существования.
+            return recipes.only('id', 'author_id')
+        return recipes
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов через быстрые сериализаторы из .values()."""
+
+        page = self.paginate_queryset(
+            self.filter_queryset(self.queryset.all()).values_list(
+                'id', flat=True
+            )
+        )
+        return self.get_paginated_response(serialize_recipes(page, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт из карточки: один запрос вместо пяти таблиц."""
+
+        recipe_id = self.get_object().id
+        return Response(serialize_recipes([recipe_id], request)[0])
+
     def perform_create(self, serializer):
         """Создание рецепта с текущим автором."""
 
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            recipe = serializer.save(author=self.request.user)
+            recipe_cards.refresh([recipe.id])
+            pantry.changed([recipe.id])
+        schedule_similar_recipes([recipe.id])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            recipe = serializer.save()
+            recipe_cards.refresh([recipe.id])
+            pantry.changed([recipe.id])
+        refresh_recipe.delay(
+            recipe.id, idempotency_key=f'refresh-recipe:{recipe.id}'
+        )
+        schedule_similar_recipes([recipe.id])
 
     def handle_add_or_remove(self, model, request, pk):
         user = request.user
@@ -157,7 +270,7 @@ class RecipeViewSet(ModelViewSet):
 
     @action(
         detail=True, methods=['post', 'delete'], url_path='shopping_cart',
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,), throttle_scope='shopping_cart'
     )
     def shopping_cart(self, request, pk=None):
         return self.handle_add_or_remove(
@@ -168,7 +281,7 @@ class RecipeViewSet(ModelViewSet):
 
     @action(
         detail=True, methods=['post', 'delete'], url_path='favorite',
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,), throttle_scope='favorite'
     )
     def favorite(self, request, pk=None):
         return self.handle_add_or_remove(
@@ -183,41 +296,130 @@ class RecipeViewSet(ModelViewSet):
     def get_short_link(self, request, pk=None):
         """Получение короткой ссылки на рецепт."""
 
-        if not self.queryset.filter(pk=pk).exists():
+        if not pk.isdigit() or not short_links.recipe_exists(int(pk)):
             raise NotFound(f'Рецепт id={pk} не найден!')
         return Response({'short-link': request.build_absolute_uri(
-            reverse('recipe-short-link', args=[pk])
+            reverse('recipe-short-link', args=[short_links.encode(int(pk))])
         )})
 
+    @action(
+        detail=True, methods=['get'], url_path='similar',
+    )
+    def similar(self, request, pk=None):
+        """
+        Похожие рецепты по продуктам и тегам из заранее посчитанного
+        списка соседей (api/similar_recipes.py).
+        """
+
+        if not pk.isdigit() or not short_links.recipe_exists(int(pk)):
+            raise NotFound(f'Рецепт id={pk} не найден!')
+        return Response(serialize_recipes(
+            RecipeSimilarity.objects.filter(recipe_id=pk).values_list(
+                'similar_id', flat=True
+            )[:settings.SIMILAR_RECIPES_COUNT],
+            request
+        ))
+
+    @action(
+        detail=False, methods=['get'], url_path='by-ingredients'
+    )
+    def by_ingredients(self, request):
+        """
+        «Что приготовить из того, что есть»: рецепты, где есть хотя бы
+        один из продуктов ?ingredients=1,2,3, по убыванию доли имеющихся
+        продуктов (coverage), затем по числу недостающих (missing).
+        """
+
+        values = [
+            value.strip()
+            for param in request.query_params.getlist('ingredients')
+            for value in param.split(',') if value.strip()
+        ]
+        if not values:
+            raise ValidationError(
+                {'ingredients': 'Укажите id продуктов.'}
+            )
+        if not all(value.isdigit() for value in values):
+            raise ValidationError(
+                {'ingredients': 'id продуктов должны быть целыми числами.'}
+            )
+        page = self.paginate_queryset(
+            pantry.index.search(int(value) for value in values)
+        )
+        return self.get_paginated_response(serialize_recipes(
+            [recipe_id for recipe_id, *_ in page], request,
+            extra={
+                recipe_id: {'coverage': round(coverage, 3),
+                            'missing': missing}
+                for recipe_id, coverage, missing in page
+            }
+        ))
+
     @action(
         detail=False, methods=['get'], url_path='download_shopping_cart',
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        throttle_scope='download_shopping_cart'
     )
     def download_shopping_cart(self, request):
+        """
+        Отдаёт список, заранее собранный фоновой задачей для текущей
+        версии корзины, иначе собирает его в запросе.
+        """
+
         user = request.user
-        recipes = Recipe.objects.filter(
-            shoppingcarts__user=user
-        )
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__in=recipes
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            total_amount=models.Sum('amount')
-        ).order_by('ingredient__name')
-        current_time = timezone.now().strftime('%Y%m%d_%H%M%S')
-        file_name = (f'shopping_list_{user.id}_{current_time}.html')
+        name = stored_name(user.id, cart_version(user.id))
+        if default_storage.exists(name):
+            return FileResponse(
+                default_storage.open(name),
+                as_attachment=True,
+                filename=file_name(user)
+            )
+        recipes = cart_recipes(user)
         return FileResponse(
-            render_to_string(
-                'shopping_list_template.html',
-                {
-                    'recipes': recipes,
-                    'total_ingredients': list(ingredients),
-                    'date': timezone.now().strftime('%d.%m.%Y')
-                }
+            io.BytesIO(
+                render_shopping_list(recipes, cart_ingredients(user)).encode()
             ),
             as_attachment=True,
-            filename=file_name
+            filename=file_name(user)
+        )
+
+    def check_throttles(self, request):
+        # Опрос готовности выгрузки частый и дешёвый: у него своя область.
+        if self.action == 'shopping_cart_export' and request.method == 'GET':
+            self.throttle_scope = 'shopping_cart_export_status'
+        super().check_throttles(request)
+
+    @action(
+        detail=False, methods=['get', 'post'],
+        url_path='download_shopping_cart/export',
+        permission_classes=(IsAuthenticated,),
+        throttle_scope='download_shopping_cart'
+    )
+    def shopping_cart_export(self, request):
+        """
+        Асинхронная выгрузка списка покупок.
+
+        POST ставит сборку файла в фоновую очередь, GET опрашивает её:
+        пока файл не готов — 202, затем перенаправление на статический
+        файл. Файл переиспользуется, пока не изменится корзина. Лимит
+        POST — область download_shopping_cart, опроса GET —
+        shopping_cart_export_status.
+        """
+
+        user = request.user
+        name = stored_name(user.id, cart_version(user.id))
+        if default_storage.exists(name):
+            url = request.build_absolute_uri(default_storage.url(name))
+            if request.method == 'GET':
+                return HttpResponseRedirect(url)
+            return Response({'status': 'ready', 'url': url})
+        # Повторная постановка не дублирует задачу в очереди.
+        build_shopping_list.delay(
+            user.id, idempotency_key=f'shopping-list:{user.id}'
+        )
+        return Response(
+            {'status': 'pending', 'url': request.build_absolute_uri()},
+            status=status.HTTP_202_ACCEPTED
         )
 
 
@@ -229,3 +431,16 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
     serializer_class = IngredientSerializer
+
+    def list(self, request, *args, **kwargs):
+        """
+        Без фильтра или с префиксом из одной буквы отдаёт предсобранный
+        каталог, иначе ищет в БД.
+        """
+
+        name = request.query_params.get('name', '')
+        if settings.INGREDIENT_CATALOG and len(name) <= 1:
+            return catalog_response(request, name.lower())
+        return Response(
+            serialize_ingredients(self.filter_queryset(self.get_queryset()))
+        )
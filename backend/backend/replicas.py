@@ -0,0 +1,83 @@
+"""
+Маршрутизация чтения на реплики БД.
+
+ReplicaRoutingMiddleware выбирает для безопасного запроса (GET, HEAD,
+OPTIONS) одну из реплик REPLICA_DATABASES, и PrimaryReplicaRouter
+отправляет на неё всё чтение этого запроса: реплики отстают по-разному, и
+запросы к разным из них (список и count, prefetch и основной запрос) могли
+бы увидеть несогласованные данные. После успешного изменяющего запроса
+клиент на REPLICA_PIN_SECONDS закрепляется за основной БД, чтобы сразу
+видеть свои изменения несмотря на отставание реплик.
+"""
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.throttling import BaseThrottle
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica = ContextVar('replica', default=None)
+
+
+def client_keys(request):
+    """
+    Ключи кэша для закрепления: по токену и по адресу клиента. Адрес
+    определяется как в лимитах запросов — по X-Forwarded-For с учётом
+    NUM_PROXIES, а не по адресу прокси.
+    """
+
+    identities = [
+        request.headers.get('Authorization', ''),
+        BaseThrottle().get_ident(request),
+    ]
+    return [
+        'replica-pin:' + hashlib.sha256(identity.encode()).hexdigest()
+        for identity in identities if identity
+    ]
+
+
+class ReplicaRoutingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        keys = client_keys(request)
+        safe = request.method in SAFE_METHODS
+        token = _replica.set(
+            random.choice(settings.REPLICA_DATABASES)
+            if safe and not cache.get_many(keys) else None
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica.reset(token)
+        if not safe and response.status_code < 400:
+            cache.set_many(
+                dict.fromkeys(keys, True), settings.REPLICA_PIN_SECONDS
+            )
+        return response
+
+
+class PrimaryReplicaRouter:
+    """Запись — в основную БД, чтение безопасных запросов — в реплики."""
+
+    def db_for_read(self, model, **hints):
+        replica = _replica.get()
+        if (
+            replica is None
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД.
+        return True
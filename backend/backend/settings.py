@@ -35,7 +35,8 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'djoser',
     'cookbook.apps.CookbookConfig',
-    'api.apps.ApiConfig'
+    'api.apps.ApiConfig',
+    'taskqueue.apps.TaskQueueConfig',
 ]
 
 MIDDLEWARE = [
@@ -66,6 +67,20 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
+
+# wsgi - синхронные воркеры gunicorn, asgi - воркеры uvicorn под gunicorn.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi').lower()
+# Асинхронные вьюхи для выгрузки списка покупок и загрузки аватара.
+ASYNC_VIEWS = os.getenv(
+    'ASYNC_VIEWS', str(SERVER_MODE == 'asgi')).lower() == 'true'
+
+# Пул соединений psycopg (Django 5.1+) вместо постоянных соединений.
+# В режиме asgi включён по умолчанию: синхронный ORM работает в потоках
+# пула, и постоянные соединения этих потоков по окончании запроса не
+# закрываются.
+DB_POOL = os.getenv(
+    'DB_POOL', str(SERVER_MODE == 'asgi')).lower() == 'true'
 
 if PROFILE == 'dev':
     DATABASES = {
@@ -83,9 +98,111 @@ else:
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'postgres_password'),
             'HOST': os.getenv('DB_HOST', 'db'),
             'PORT': os.getenv('DB_PORT', '5432'),
+            # Постоянные соединения; при включённом пуле и в режиме asgi
+            # по умолчанию отключены.
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv(
+                'DB_CONN_MAX_AGE', '0' if SERVER_MODE == 'asgi' else '60')),
+            'CONN_HEALTH_CHECKS': os.getenv(
+                'DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true',
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                    'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+                },
+            } if DB_POOL else {},
         }
     }
 
+# Общий для всех воркеров кэш (Redis), в режиме разработки - в памяти.
+REDIS_URL = os.getenv('REDIS_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Короткие ссылки: постоянный (301) или временный (302) редирект, время
+# кэширования ответа клиентами и проверки рецепта в кэше, счётчик переходов.
+SHORT_LINK_PERMANENT = os.getenv(
+    'SHORT_LINK_PERMANENT', 'False').lower() == 'true'
+SHORT_LINK_CACHE_MAX_AGE = int(os.getenv('SHORT_LINK_CACHE_MAX_AGE', '3600'))
+SHORT_LINK_CACHE_TIMEOUT = int(os.getenv('SHORT_LINK_CACHE_TIMEOUT', '86400'))
+SHORT_LINK_CLICKS = os.getenv('SHORT_LINK_CLICKS', 'False').lower() == 'true'
+SHORT_LINK_CLICKS_BATCH = int(os.getenv('SHORT_LINK_CLICKS_BATCH', '100'))
+SHORT_LINK_CLICKS_INTERVAL = int(os.getenv('SHORT_LINK_CLICKS_INTERVAL', '60'))
+
+# Кэш пользователей по токену: время жизни в общем кэше и в памяти воркера
+# (за это время другие воркеры могут не заметить выход или изменения),
+# размер кэша в памяти.
+TOKEN_AUTH_CACHE_TIMEOUT = int(os.getenv('TOKEN_AUTH_CACHE_TIMEOUT', '300'))
+TOKEN_AUTH_LOCAL_TIMEOUT = int(os.getenv('TOKEN_AUTH_LOCAL_TIMEOUT', '5'))
+TOKEN_AUTH_LOCAL_SIZE = int(os.getenv('TOKEN_AUTH_LOCAL_SIZE', '1024'))
+
+# Время жизни кэша множеств избранного, корзины и подписок пользователя.
+USER_RELATIONS_CACHE_TIMEOUT = int(
+    os.getenv('USER_RELATIONS_CACHE_TIMEOUT', '3600'))
+
+# Сколько записей журнала изменений связей отдаётся за один запрос
+# синхронизации (/api/users/me/changes/).
+RELATION_CHANGES_PAGE_SIZE = int(
+    os.getenv('RELATION_CHANGES_PAGE_SIZE', '1000'))
+# Через сколько секунд запись журнала считается устоявшейся и курсор
+# синхронизации может её пройти. Должно быть больше самой долгой
+# транзакции, пишущей в журнал (удаление автора, пакетное удаление в
+# админке), с запасом на расхождение часов серверов.
+RELATION_CHANGES_SETTLE_TIME = int(
+    os.getenv('RELATION_CHANGES_SETTLE_TIME', '300'))
+
+# Индекс поиска по продуктам (/api/recipes/by-ingredients/): сколько живёт
+# журнал изменённых рецептов в кэше и при каком отставании воркер строит
+# индекс заново вместо догона журнала.
+PANTRY_CHANGES_TIMEOUT = int(os.getenv('PANTRY_CHANGES_TIMEOUT', '86400'))
+PANTRY_MAX_CHANGES = int(os.getenv('PANTRY_MAX_CHANGES', '1000'))
+
+# Похожие рецепты (/api/recipes/{id}/similar/): сколько соседей хранится
+# для рецепта, вес совпадения тегов против продуктов и в скольких рецептах
+# максимум может быть продукт, чтобы по нему искались кандидаты.
+SIMILAR_RECIPES_COUNT = int(os.getenv('SIMILAR_RECIPES_COUNT', '10'))
+SIMILAR_RECIPES_TAG_WEIGHT = float(
+    os.getenv('SIMILAR_RECIPES_TAG_WEIGHT', '0.2'))
+SIMILAR_RECIPES_MAX_POSTING = int(
+    os.getenv('SIMILAR_RECIPES_MAX_POSTING', '5000'))
+
+# Фоновые задачи: брокер (DatabaseBroker, RedisBroker или EagerBroker для
+# выполнения сразу), базовая пауза перед повтором и время, после которого
+# задача упавшего воркера возвращается в очередь.
+TASKS_BROKER = os.getenv(
+    'TASKS_BROKER', 'taskqueue.brokers.DatabaseBroker')
+TASKS_RETRY_DELAY = int(os.getenv('TASKS_RETRY_DELAY', '10'))
+TASKS_VISIBILITY_TIMEOUT = int(os.getenv('TASKS_VISIBILITY_TIMEOUT', '600'))
+
+# Реплики для чтения: имена файлов SQLite в режиме dev или host[:port]
+# серверов PostgreSQL, через запятую.
+REPLICA_DATABASES = []
+for number, replica in enumerate(
+    filter(None, re.split(r',\s*', os.getenv('DB_REPLICAS', ''))), 1
+):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+    if PROFILE == 'dev':
+        DATABASES[alias]['NAME'] = BASE_DIR / replica
+    else:
+        host, _, port = replica.partition(':')
+        DATABASES[alias]['HOST'] = host
+        DATABASES[alias]['PORT'] = port or DATABASES['default']['PORT']
+    REPLICA_DATABASES.append(alias)
+
+# Сколько секунд после изменения клиент читает из основной БД.
+REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '5'))
+
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS = ['backend.replicas.PrimaryReplicaRouter']
+    MIDDLEWARE.append('backend.replicas.ReplicaRoutingMiddleware')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,6 +234,14 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Размер пачки для удаления из админки действием «Удалить пачками».
+ADMIN_DELETE_BATCH_SIZE = int(os.getenv('ADMIN_DELETE_BATCH_SIZE', '100'))
+
+# Предсобранный JSON-каталог продуктов, который nginx отдаёт напрямую.
+INGREDIENT_CATALOG = os.getenv(
+    'INGREDIENT_CATALOG', 'True').lower() == 'true'
+INGREDIENT_CATALOG_ROOT = os.path.join(MEDIA_ROOT, 'catalog')
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
@@ -125,12 +250,47 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
 
+    # Лимиты включаются у action'ов с throttle_scope (api/throttling.py).
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.UserActionThrottle',
+        'api.throttling.IPActionThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'favorite': os.getenv('THROTTLE_FAVORITE', '60/min'),
+        'favorite_ip': os.getenv('THROTTLE_FAVORITE_IP', '300/min'),
+        'shopping_cart': os.getenv('THROTTLE_SHOPPING_CART', '60/min'),
+        'shopping_cart_ip': os.getenv('THROTTLE_SHOPPING_CART_IP', '300/min'),
+        'subscribe': os.getenv('THROTTLE_SUBSCRIBE', '30/min'),
+        'subscribe_ip': os.getenv('THROTTLE_SUBSCRIBE_IP', '150/min'),
+        'download_shopping_cart': os.getenv(
+            'THROTTLE_DOWNLOAD_SHOPPING_CART', '10/min'),
+        'download_shopping_cart_ip': os.getenv(
+            'THROTTLE_DOWNLOAD_SHOPPING_CART_IP', '50/min'),
+        'shopping_cart_export_status': os.getenv(
+            'THROTTLE_SHOPPING_CART_EXPORT_STATUS', '120/min'),
+        'shopping_cart_export_status_ip': os.getenv(
+            'THROTTLE_SHOPPING_CART_EXPORT_STATUS_IP', '600/min'),
+    },
+    # Число прокси перед приложением (nginx) для определения адреса клиента.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', '1')),
+
 }
 
 CSRF_TRUSTED_ORIGINS = re.split(
@@ -0,0 +1,132 @@
+from contextlib import ExitStack
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from backend.replicas import PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from cookbook.models import Recipe, Tag
+
+User = get_user_model()
+
+REPLICAS = ['replica_1', 'replica_2']
+
+
+@override_settings(REPLICA_DATABASES=REPLICAS, REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Выбор БД для чтения без запросов к самим репликам."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def request(self, method='GET', status=200, token='', reads=20):
+        """Запрос через middleware; возвращает БД, выбранные для чтения."""
+
+        aliases = []
+
+        def view(request):
+            aliases.extend(
+                PrimaryReplicaRouter().db_for_read(Recipe)
+                for _ in range(reads)
+            )
+            return HttpResponse(status=status)
+
+        request = self.factory.generic(
+            method, '/', HTTP_AUTHORIZATION=token
+        )
+        ReplicaRoutingMiddleware(view)(request)
+        return aliases
+
+    def test_one_replica_per_request(self):
+        chosen = set()
+        for _ in range(50):
+            aliases = set(self.request())
+            self.assertEqual(len(aliases), 1)
+            chosen |= aliases
+        self.assertEqual(chosen, set(REPLICAS))
+
+    def test_unsafe_request_reads_primary(self):
+        self.assertEqual(set(self.request('POST')), {DEFAULT_DB_ALIAS})
+
+    def test_outside_request_reads_primary(self):
+        self.assertEqual(
+            PrimaryReplicaRouter().db_for_read(Recipe), DEFAULT_DB_ALIAS
+        )
+
+    def test_successful_write_pins_client(self):
+        self.request('POST', status=201, token='Token 1')
+        self.assertEqual(set(self.request()), {DEFAULT_DB_ALIAS})
+        # Закрепление действует и по адресу, и по токену.
+        self.assertEqual(
+            set(self.request(token='Token 1')), {DEFAULT_DB_ALIAS}
+        )
+
+    def test_failed_write_does_not_pin(self):
+        self.request('POST', status=400)
+        self.assertIn(self.request()[0], REPLICAS)
+
+
+@skipUnless(
+    len(settings.REPLICA_DATABASES) > 1,
+    'нужны две реплики в DB_REPLICAS'
+)
+class ReplicaQueriesTests(TransactionTestCase):
+    """
+    Запросы к тестовым репликам (зеркалам основной тестовой БД). Внутри
+    TestCase всё читается из основной БД — она в открытой транзакции.
+    """
+
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        recipe = Recipe.objects.create(
+            author=author, name='Рецепт', text='Описание',
+            image='recipes/images/1.png', cooking_time=10
+        )
+        recipe.tags.add(Tag.objects.create(name='Ужин', slug='dinner'))
+        self.client = APIClient()
+
+    def read_aliases(self):
+        """БД, из которых читал запрос к списку рецептов."""
+
+        with ExitStack() as stack:
+            contexts = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in settings.REPLICA_DATABASES
+            }
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        return {alias for alias, context in contexts.items() if context}
+
+    def test_request_reads_from_one_replica(self):
+        chosen = set()
+        for _ in range(30):
+            aliases = self.read_aliases()
+            self.assertEqual(len(aliases), 1)
+            chosen |= aliases
+        self.assertEqual(chosen, set(settings.REPLICA_DATABASES))
+        self.assertEqual(router.db_for_read(Recipe), DEFAULT_DB_ALIAS)
+
+    def test_write_pins_client_to_primary(self):
+        response = self.client.post('/api/users/', {
+            'username': 'reader', 'email': 'reader@example.com',
+            'first_name': 'Читатель', 'last_name': 'Первый',
+            'password': 'Sup3r-secret-pass',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.read_aliases(), set())
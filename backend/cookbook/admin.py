@@ -1,21 +1,56 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.admin.decorators import register
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import (Aggregate, Count, OuterRef, Prefetch, Q,
+                              Subquery)
+from django.db.models.functions import Coalesce
 from django.utils.safestring import mark_safe
 
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag, User)
+                     RecipeTag, ShoppingCart, Subscription, Tag, User)
+from .deletion import delete_in_batches
+from .signals import recipes_changed
+
+COOKING_TIME_LIMITS_CACHE_KEY = 'admin-cooking-time-limits'
+COOKING_TIME_LIMITS_TIMEOUT = 300
 
 admin.site.unregister(Group)
 
 
+@admin.action(
+    description='Удалить выбранные пачками (без подтверждения)',
+    permissions=['delete']
+)
+def delete_selected_in_batches(modeladmin, request, queryset):
+    """
+    Удаление без страницы подтверждения, которая собирает все связанные
+    объекты: связи удаляются каскадом в БД, объекты — пачками по
+    ADMIN_DELETE_BATCH_SIZE.
+    """
+
+    deleted = delete_in_batches(queryset, settings.ADMIN_DELETE_BATCH_SIZE)
+    modeladmin.message_user(
+        request, f'Удалено объектов «{queryset.model._meta.verbose_name}»: '
+                 f'{deleted}.'
+    )
+
+
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 0
     min_num = 1
 
 
+class RecipeTagInline(admin.TabularInline):
+    model = RecipeTag
+    extra = 0
+    autocomplete_fields = ('tag',)
+
+
 class BaseHasFilter(admin.SimpleListFilter):
     filter_field = None
     filter_title = None
@@ -67,16 +102,36 @@ class HasInRecipesFilter(BaseHasFilter):
     filter_param = 'in_recipes'
 
 
+def count_subquery(queryset, field):
+    """Количество связанных строк подзапросом, без JOIN к списку."""
+
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
 class CountMixin:
     """
     Общий класс отображения количества рецептов, тегов или продуктов
     в списке объектов.
     """
     list_display = ('recipe_count', )
+    # Модель со ссылкой на рецепт и поле в ней, ссылающееся на объект.
+    recipes_model = None
+    recipes_field = None
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_count=count_subquery(
+                self.recipes_model.objects.all(), self.recipes_field
+            )
+        )
 
-    @admin.display(description='Рецептов')
+    @admin.display(description='Рецептов', ordering='recipes_count')
     def recipe_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
 @register(User)
@@ -96,9 +151,17 @@ class AdminUser(CountMixin, UserAdmin):
     list_filter = (
         HasRecipesFilter, HasSubscriptionsFilter, HasFollowersFilter
     )
+    recipes_model = Recipe
+    recipes_field = 'author'
+    show_full_result_count = False
+    actions = (delete_selected_in_batches,)
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('recipes')
+        subscriptions = Subscription.objects.all()
+        return super().get_queryset(request).annotate(
+            subscriptions_count=count_subquery(subscriptions, 'user'),
+            followers_count=count_subquery(subscriptions, 'author'),
+        )
 
     @admin.display(description='ФИО')
     def fullname(self, user):
@@ -114,19 +177,21 @@ class AdminUser(CountMixin, UserAdmin):
                     )
         return 'Аватар не загружен'
 
-    @admin.display(description='Подписки')
+    @admin.display(description='Подписки', ordering='subscriptions_count')
     def subscription_count(self, user):
-        return user.subscriptions.count()
+        return user.subscriptions_count
 
-    @admin.display(description='Подписчики')
+    @admin.display(description='Подписчики', ordering='followers_count')
     def follower_count(self, user):
-        return user.authors.count()
+        return user.followers_count
 
 
 @register(Tag)
 class TagAdmin(CountMixin, admin.ModelAdmin):
     list_display = (*CountMixin.list_display, 'pk', 'name', 'slug')
     search_fields = ('name', 'slug')
+    recipes_model = Recipe.tags.through
+    recipes_field = 'tag'
 
 
 @register(Ingredient)
@@ -135,7 +200,22 @@ class IngredientAdmin(CountMixin, admin.ModelAdmin):
         *CountMixin.list_display, 'pk', 'name', 'measurement_unit'
     )
     search_fields = ('name',)
-    list_filter = ('name', 'measurement_unit', HasInRecipesFilter)
+    list_filter = ('measurement_unit', HasInRecipesFilter)
+    recipes_model = RecipeIngredient
+    recipes_field = 'ingredient'
+    show_full_result_count = False
+
+
+class PercentileDisc(Aggregate):
+    """Перцентиль из значений столбца (только PostgreSQL)."""
+
+    function = 'PERCENTILE_DISC'
+    template = (
+        '%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    )
+
+    def __init__(self, expression, percentile, **extra):
+        super().__init__(expression, percentile=percentile, **extra)
 
 
 class CookingTimeFilter(admin.SimpleListFilter):
@@ -165,41 +245,71 @@ class CookingTimeFilter(admin.SimpleListFilter):
             }
         }
 
-    def _get_limits(self, recipes):
-        """Вычисляет границы."""
-        times = sorted(set(cook_time for cook_time in recipes.values_list(
-            'cooking_time', flat=True) if cook_time is not None)
-        )
-        total = len(times)
-        if total >= 3:
-            return times[total // 3], times[2 * total // 3]
-        return (None, None)
+    def _calculate_limits(self):
+        """
+        Границы терцилей времени готовки и количество рецептов в каждом
+        диапазоне. В PostgreSQL терцили считает PERCENTILE_DISC.
+        """
+        recipes = Recipe.objects.order_by()
+        if connection.vendor == 'postgresql':
+            limits = recipes.aggregate(
+                short=PercentileDisc('cooking_time', 1 / 3),
+                medium=PercentileDisc('cooking_time', 2 / 3),
+                total=Count('pk'),
+            )
+            total = limits['total']
+        else:
+            total = recipes.count()
+            times = recipes.order_by('cooking_time').values_list(
+                'cooking_time', flat=True
+            )
+            limits = {
+                'short': times[total // 3],
+                'medium': times[2 * total // 3],
+            } if total >= 3 else {}
+        if total < 3:
+            return None
+        ranges = self.get_time_ranges(limits['short'], limits['medium'])
+        return {
+            'short': limits['short'],
+            'medium': limits['medium'],
+            'counts': recipes.aggregate(**{
+                key: Count('pk', filter=Q(**config['lookup']))
+                for key, config in ranges.items()
+            }),
+        }
+
+    def _get_limits(self):
+        """Границы с кэшированием: не пересчитываются на каждой странице."""
+        limits = cache.get(COOKING_TIME_LIMITS_CACHE_KEY)
+        if limits is None:
+            limits = self._calculate_limits() or {}
+            cache.set(
+                COOKING_TIME_LIMITS_CACHE_KEY, limits,
+                COOKING_TIME_LIMITS_TIMEOUT
+            )
+        return limits
 
     def lookups(self, request, model_admin):
-        recipes = model_admin.get_queryset(request)
-        short_limit, medium_limit = self._get_limits(recipes)
-        if short_limit is None or medium_limit is None:
+        limits = self._get_limits()
+        if not limits:
             return []
 
         return [
-            (
-                key,
-                f'{config["verbose_name"]} '
-                f'({recipes.filter(**config["lookup"]).count()})'
-            )
+            (key, f'{config["verbose_name"]} ({limits["counts"][key]})')
             for key, config in self.get_time_ranges(
-                short_limit, medium_limit
+                limits['short'], limits['medium']
             ).items()
         ]
 
     def queryset(self, request, recipes):
-        if self.value() not in ['short', 'medium', 'long']:
+        limits = self._get_limits()
+        if not limits or self.value() not in ['short', 'medium', 'long']:
             return recipes
 
-        short_limit, medium_limit = self._get_limits(recipes)
-        time_ranges = self.get_time_ranges(short_limit, medium_limit)
+        time_ranges = self.get_time_ranges(limits['short'], limits['medium'])
 
-        return recipes.filter(**time_ranges[self.value]['lookup'])
+        return recipes.filter(**time_ranges[self.value()]['lookup'])
 
 
 @register(Recipe)
@@ -217,11 +327,31 @@ class RecipeAdmin(admin.ModelAdmin):
         CookingTimeFilter
     )
     autocomplete_fields = ('tags', 'ingredients')
-    inlines = (RecipeIngredientInline,)
+    inlines = (RecipeIngredientInline, RecipeTagInline)
+    list_select_related = ('author',)
+    show_full_result_count = False
+    actions = (delete_selected_in_batches,)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            favorites_total=count_subquery(Favorite.objects.all(), 'recipe')
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
+        )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipes_changed.send(
+            sender=Recipe, recipe_ids=[form.instance.pk]
+        )
 
-    @admin.display(description='В избранном')
+    @admin.display(description='В избранном', ordering='favorites_total')
     def favorites_count(self, recipe):
-        return recipe.favorites.count()
+        return recipe.favorites_total
 
     @admin.display(description='Ингредиенты')
     @mark_safe
@@ -249,16 +379,28 @@ class RecipeAdmin(admin.ModelAdmin):
 @register(RecipeIngredient)
 class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('pk', 'recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    show_full_result_count = False
     search_fields = ('recipe__name', 'ingredient__name')
     list_filter = (
         ('recipe', admin.RelatedOnlyFieldListFilter),
         ('ingredient', admin.RelatedOnlyFieldListFilter)
     )
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        recipes_changed.send(sender=Recipe, recipe_ids=[obj.recipe_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        recipes_changed.send(sender=Recipe, recipe_ids=[obj.recipe_id])
+
 
 @register(Favorite, ShoppingCart)
 class FavoriteShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    show_full_result_count = False
     search_fields = ('user__username', 'recipe__name')
     list_filter = (
         ('user', admin.RelatedOnlyFieldListFilter),
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CookbookConfig(AppConfig):
     name = 'cookbook'
     verbose_name = 'Кулинарная книга'
+
+    def ready(self):
+        from . import signals  # noqa: F401
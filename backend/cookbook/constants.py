@@ -11,3 +11,23 @@ MAX_LENGTH_TAG = 32
 
 MIN_COOKING_TIME = 1
 MIN_INGREDIENTS_AMOUNT = 1
+
+# Короткие ссылки: алфавит base62 и обратимое перемешивание id рецепта,
+# чтобы коды не шли подряд. SHORT_LINK_MULTIPLIER должен быть нечётным.
+SHORT_LINK_ALPHABET = (
+    'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+)
+SHORT_LINK_MODULUS = 2 ** 40
+SHORT_LINK_MULTIPLIER = 0x5DEECE66D
+
+# Пересчёт единиц измерения (cookbook/units.py): единица — базовая единица
+# и сколько базовых в одной. Единицы из data/ingredients.csv, которых здесь
+# нет (шт., ч. л., щепотка...), считаются базовыми сами для себя: их вес
+# или объём зависит от продукта.
+MEASUREMENT_UNITS = {
+    'мг': ('г', 0.001),
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+}
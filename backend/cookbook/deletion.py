@@ -0,0 +1,79 @@
+"""
+Удаление с каскадом на стороне БД.
+
+Рецепты автора и связи рецептов и пользователей (теги и продукты
+рецепта, избранное, корзина, подписки, карточки) удаляются через ON DELETE
+CASCADE, без загрузки строк в Collector, поэтому сигналы для них не
+приходят. Записи об удалении в журнал RelationChange добавляются заранее
+одним INSERT ... SELECT (сигналы pre_delete в cookbook/signals.py), для
+рецептов автора — один раз в pre_delete автора.
+"""
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Now
+
+from .models import Favorite, RelationChange, ShoppingCart, Subscription
+
+
+def insert_from_select(model, queryset):
+    """
+    INSERT INTO model SELECT ... из queryset.values() без загрузки строк.
+
+    Имена в values() должны совпадать с полями model и идти в том же
+    порядке.
+    """
+
+    columns = ', '.join(
+        connection.ops.quote_name(model._meta.get_field(name).column)
+        for name in queryset.query.values_select
+        + tuple(queryset.query.annotation_select)
+    )
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {connection.ops.quote_name(model._meta.db_table)} '
+            f'({columns}) {sql}',
+            params
+        )
+
+
+def log_removals(relations, object_field):
+    """Журнал RelationChange: связи relations будут удалены."""
+
+    insert_from_select(RelationChange, relations.order_by().values(
+        'user',
+        kind=Value(relations.model._meta.model_name),
+        object_id=F(object_field),
+        added=Value(False),
+        created_at=Now()
+    ))
+
+
+def log_recipe_removals(recipes):
+    for model in (Favorite, ShoppingCart):
+        log_removals(model.objects.filter(recipe__in=recipes), 'recipe_id')
+
+
+def log_author_removals(authors):
+    """Подписчики удаляемых авторов теряют подписку."""
+
+    log_removals(
+        Subscription.objects.filter(author__in=authors), 'author_id'
+    )
+
+
+def delete_in_batches(queryset, batch_size):
+    """
+    Удаляет объекты queryset пачками по batch_size в отдельных
+    транзакциях, чтобы не держать долгих блокировок. Возвращает число
+    удалённых объектов queryset.
+    """
+
+    model = queryset.model
+    pks = queryset.order_by().values_list('pk', flat=True)
+    deleted = 0
+    while batch := list(pks[:batch_size]):
+        with transaction.atomic():
+            _, counts = model.objects.filter(pk__in=batch).delete()
+        deleted += counts.get(model._meta.label, 0)
+    return deleted
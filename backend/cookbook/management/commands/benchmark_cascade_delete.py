@@ -0,0 +1,118 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from cookbook.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                             ShoppingCart, Subscription, User)
+
+RELATED = (
+    (RecipeIngredient, 'recipe__author'),
+    (Favorite, 'recipe__author'),
+    (ShoppingCart, 'recipe__author'),
+    (Subscription, 'author'),
+)
+
+
+@contextmanager
+def python_cascade():
+    """
+    Временно заменяет DB_CASCADE на CASCADE: Collector снова загружает
+    связанные строки и шлёт по ним сигналы, как до каскада в БД.
+    """
+
+    fields = [
+        field for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if field.remote_field is not None
+        and getattr(field.remote_field, 'on_delete', None)
+        is models.DB_CASCADE
+    ]
+    for field in fields:
+        field.remote_field.on_delete = models.CASCADE
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.remote_field.on_delete = models.DB_CASCADE
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнить время и память удаления автора с большим числом рецептов: '
+        'каскад в БД против CASCADE в Python (Collector)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=200)
+        parser.add_argument('--ingredients', type=int, default=10)
+        parser.add_argument('--followers', type=int, default=100)
+
+    def create_author(self, options):
+        author = User.objects.create_user(
+            username='benchmark_author', email='benchmark_author@example.com'
+        )
+        followers = User.objects.bulk_create(
+            User(username=f'benchmark_{number}',
+                 email=f'benchmark_{number}@example.com')
+            for number in range(options['followers'])
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {number}', text='-')
+            for number in range(options['recipes'])
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'benchmark {number}', measurement_unit='г')
+            for number in range(options['ingredients'])
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes for ingredient in ingredients
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                model(user=user, recipe=recipe)
+                for user in followers for recipe in recipes
+            )
+        Subscription.objects.bulk_create(
+            Subscription(user=user, author=author) for user in followers
+        )
+        return author
+
+    def delete_python_cascade(self, author_id):
+        with python_cascade():
+            User.objects.get(pk=author_id).delete()
+
+    def delete_db_cascade(self, author_id):
+        User.objects.get(pk=author_id).delete()
+
+    def measure(self, title, delete, author_id):
+        savepoint = transaction.savepoint()
+        tracemalloc.start()
+        started = time.perf_counter()
+        delete(author_id)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        transaction.savepoint_rollback(savepoint)
+        self.stdout.write(
+            f'{title}: {elapsed * 1000:.1f} мс, '
+            f'пик памяти {peak / 1024 / 1024:.2f} МБ'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            author = self.create_author(options)
+            rows = sum(
+                model.objects.filter(**{field: author}).count()
+                for model, field in RELATED
+            )
+            self.stdout.write(f'Связанных строк: {rows}')
+            self.measure(
+                'CASCADE в Python', self.delete_python_cascade, author.pk
+            )
+            self.measure('Каскад в БД', self.delete_db_cascade, author.pk)
+            transaction.set_rollback(True)
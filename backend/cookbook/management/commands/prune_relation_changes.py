@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cookbook.models import RelationChange
+
+
+class Command(BaseCommand):
+    help = (
+        'Удалить старые записи журнала изменений связей; клиенты с более '
+        'старым курсором получат полное состояние'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30)
+
+    def handle(self, *args, **options):
+        deleted, _ = RelationChange.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=options['days'])
+        ).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей журнала: {deleted}.'
+        ))
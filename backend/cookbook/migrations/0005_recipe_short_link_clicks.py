@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0004_recipe_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='short_link_clicks',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Переходов по короткой ссылке'),
+        ),
+    ]
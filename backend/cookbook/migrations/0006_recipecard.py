@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-19 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0005_recipe_short_link_clicks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCard',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='cookbook.recipe', verbose_name='Рецепт')),
+                ('document', models.JSONField(verbose_name='Документ')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлена')),
+            ],
+            options={
+                'verbose_name': 'Карточка рецепта',
+                'verbose_name_plural': 'Карточки рецептов',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-19 16:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0006_recipecard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelationChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('favorite', 'Избранное'), ('shoppingcart', 'Корзина'), ('subscription', 'Подписка')], max_length=16, verbose_name='Связь')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='id рецепта или автора')),
+                ('added', models.BooleanField(verbose_name='Добавлено')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время')),
+                ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='relation_changes', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Изменение связи',
+                'verbose_name_plural': 'Изменения связей',
+                'ordering': ('id',),
+                'indexes': [models.Index(fields=['user', 'id'], name='relation_change_user_id_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,115 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0007_relationchange'),
+    ]
+
+    operations = [
+        # Recipe.tags получает явную промежуточную модель на той же таблице:
+        # данные не переносятся, меняются только ограничения ниже.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='RecipeTag',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cookbook.recipe')),
+                        ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cookbook.tag')),
+                    ],
+                    options={
+                        'db_table': 'cookbook_recipe_tags',
+                        'unique_together': {('recipe', 'tag')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='tags',
+                    field=models.ManyToManyField(through='cookbook.RecipeTag', to='cookbook.tag', verbose_name='Теги'),
+                ),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='recipetag',
+            options={'default_related_name': 'recipe_tags', 'verbose_name': 'Тег рецепта', 'verbose_name_plural': 'Теги рецептов'},
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipetag',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='favorite',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, to='cookbook.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='favorite',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='recipecard',
+            name='recipe',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.DB_CASCADE, primary_key=True, related_name='card', serialize=False, to='cookbook.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='recipeingredient',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, to='cookbook.ingredient', verbose_name='Продукт'),
+        ),
+        migrations.AlterField(
+            model_name='recipeingredient',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, to='cookbook.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='recipetag',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, to='cookbook.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='recipetag',
+            name='tag',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, to='cookbook.tag', verbose_name='Тег'),
+        ),
+        migrations.AlterField(
+            model_name='relationchange',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='relation_changes', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, to='cookbook.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='shoppingcart',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, related_name='authors', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, related_name='subscriptions', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipetag',
+            constraint=models.UniqueConstraint(fields=('recipe', 'tag'), name='unique_recipe_tag'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.1.2 on 2026-10-19 10:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0008_db_cascades'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('recipe', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.DB_CASCADE, related_name='similarities', to='cookbook.recipe', verbose_name='Рецепт')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.DB_CASCADE, related_name='+', to='cookbook.recipe', verbose_name='Похожий рецепт')),
+            ],
+            options={
+                'verbose_name': 'Похожий рецепт',
+                'verbose_name_plural': 'Похожие рецепты',
+                'ordering': ('recipe', '-score'),
+                'indexes': [models.Index(fields=['recipe', '-score'], name='recipe_similarity_score_idx')],
+            },
+        ),
+    ]
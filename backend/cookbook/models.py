@@ -62,12 +62,12 @@ class UserRecipeRelationModel(models.Model):
     """
     user = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DB_CASCADE,
         verbose_name='Пользователь',
     )
     recipe = models.ForeignKey(
         'Recipe',
-        on_delete=models.CASCADE,
+        on_delete=models.DB_CASCADE,
         verbose_name='Рецепт',
     )
 
@@ -139,9 +139,12 @@ class Recipe(models.Model):
         null=True,
     )
     text = models.TextField('Описание')
+    # Рецепты автора и все их связи удаляются каскадом в БД: Django 6.1
+    # требует одного вида on_delete во всей цепочке ссылок, поэтому у тегов
+    # своя промежуточная модель (RecipeTag).
     author = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DB_CASCADE,
         verbose_name='Автор',
     )
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
@@ -152,6 +155,7 @@ class Recipe(models.Model):
     )
     tags = models.ManyToManyField(
         Tag,
+        through='RecipeTag',
         verbose_name='Теги',
     )
     cooking_time = models.PositiveIntegerField(
@@ -159,12 +163,25 @@ class Recipe(models.Model):
         default=MIN_COOKING_TIME,
         validators=[MinValueValidator(MIN_COOKING_TIME)]
     )
+    short_link_clicks = models.PositiveIntegerField(
+        'Переходов по короткой ссылке',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         default_related_name = 'recipes'
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            # Лента рецептов и рецепты автора (?author=) по дате.
+            models.Index(fields=['-pub_date'], name='recipe_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -174,12 +191,12 @@ class RecipeIngredient(models.Model):
     """Связь рецепта и продукта с количеством."""
     recipe = models.ForeignKey(
         Recipe,
-        on_delete=models.CASCADE,
+        on_delete=models.DB_CASCADE,
         verbose_name='Рецепт',
     )
     ingredient = models.ForeignKey(
         Ingredient,
-        on_delete=models.CASCADE,
+        on_delete=models.DB_CASCADE,
         verbose_name='Продукт',
     )
     amount = models.PositiveIntegerField(
@@ -205,6 +222,36 @@ class RecipeIngredient(models.Model):
                 f'{self.ingredient.measurement_unit}')
 
 
+class RecipeTag(models.Model):
+    """Связь рецепта и тега."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.DB_CASCADE,
+        verbose_name='Рецепт',
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.DB_CASCADE,
+        verbose_name='Тег',
+    )
+
+    class Meta:
+        # Таблица бывшей автоматической связи Recipe.tags.
+        db_table = 'cookbook_recipe_tags'
+        verbose_name = 'Тег рецепта'
+        verbose_name_plural = 'Теги рецептов'
+        default_related_name = 'recipe_tags'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'tag'],
+                name='unique_recipe_tag'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe.name}: {self.tag.name}'
+
+
 class Favorite(UserRecipeRelationModel):
     """Избранное — рецепт, сохранённый пользователем."""
     class Meta(UserRecipeRelationModel.Meta):
@@ -223,13 +270,13 @@ class Subscription(models.Model):
     """Подписка пользователя на автора."""
     user = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DB_CASCADE,
         verbose_name='Подписчик',
         related_name='subscriptions',
     )
     author = models.ForeignKey(
         User,
-        on_delete=models.CASCADE,
+        on_delete=models.DB_CASCADE,
         verbose_name='Автор',
         related_name='authors',
     )
@@ -251,3 +298,104 @@ class Subscription(models.Model):
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}.'
+
+
+class RecipeCard(models.Model):
+    """
+    Готовое представление рецепта для чтения: теги, продукты и автор
+    в одном JSON-документе без данных конкретного пользователя.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.DB_CASCADE,
+        primary_key=True,
+        related_name='card',
+        verbose_name='Рецепт',
+    )
+    document = models.JSONField('Документ')
+    updated_at = models.DateTimeField('Обновлена', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Карточка рецепта'
+        verbose_name_plural = 'Карточки рецептов'
+
+    def __str__(self):
+        return f'Карточка рецепта {self.recipe_id}'
+
+
+class RecipeSimilarity(models.Model):
+    """
+    Похожий рецепт из заранее посчитанного списка соседей рецепта
+    (api/similar_recipes.py).
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.DB_CASCADE,
+        db_index=False,
+        related_name='similarities',
+        verbose_name='Рецепт',
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.DB_CASCADE,
+        related_name='+',
+        verbose_name='Похожий рецепт',
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('recipe', '-score')
+        indexes = [
+            # Список соседей рецепта читается одним проходом по индексу.
+            models.Index(
+                fields=['recipe', '-score'], name='recipe_similarity_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}: {self.score:.2f}'
+
+
+class RelationChange(models.Model):
+    """
+    Журнал изменений избранного, корзины и подписок пользователя.
+
+    Записи только добавляются; id записи служит курсором синхронизации.
+    """
+
+    class Kind(models.TextChoices):
+        FAVORITE = 'favorite', 'Избранное'
+        SHOPPING_CART = 'shoppingcart', 'Корзина'
+        SUBSCRIPTION = 'subscription', 'Подписка'
+
+    # Без внешнего ключа в БД: записи об удалении связей появляются и при
+    # удалении самого пользователя. Записи удалённых пользователей
+    # очищает prune_relation_changes.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='relation_changes',
+        verbose_name='Пользователь',
+    )
+    kind = models.CharField('Связь', max_length=16, choices=Kind.choices)
+    object_id = models.PositiveBigIntegerField('id рецепта или автора')
+    added = models.BooleanField('Добавлено')
+    created_at = models.DateTimeField('Время', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Изменение связи'
+        verbose_name_plural = 'Изменения связей'
+        ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=['user', 'id'], name='relation_change_user_id_idx'
+            ),
+        ]
+
+    def __str__(self):
+        action = 'добавлено' if self.added else 'удалено'
+        return f'{self.get_kind_display()} {self.object_id}: {action}'
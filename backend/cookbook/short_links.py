@@ -0,0 +1,115 @@
+"""
+Короткие ссылки на рецепты.
+
+Код — это id рецепта, обратимо перемешанный и записанный в base62 (первый
+символ всегда буква, чтобы код не путался со старыми ссылками /s/<id>/).
+Проверка существования рецепта кэшируется, поэтому популярные ссылки
+открываются без запросов к БД. Переходы считаются в памяти воркера и
+записываются в БД пачками.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .constants import (SHORT_LINK_ALPHABET, SHORT_LINK_MODULUS,
+                        SHORT_LINK_MULTIPLIER)
+from .models import Recipe
+
+LETTERS = 52
+BASE = len(SHORT_LINK_ALPHABET)
+INVERSE = pow(SHORT_LINK_MULTIPLIER, -1, SHORT_LINK_MODULUS)
+
+
+def encode(pk):
+    number = pk * SHORT_LINK_MULTIPLIER % SHORT_LINK_MODULUS
+    number, first = divmod(number, LETTERS)
+    code = [SHORT_LINK_ALPHABET[first]]
+    while number:
+        number, digit = divmod(number, BASE)
+        code.append(SHORT_LINK_ALPHABET[digit])
+    return ''.join(code)
+
+
+def decode(code):
+    """id рецепта по коду или None для некорректного кода."""
+
+    if not code or SHORT_LINK_ALPHABET.find(code[0]) not in range(LETTERS):
+        return None
+    number = 0
+    for char in reversed(code[1:]):
+        digit = SHORT_LINK_ALPHABET.find(char)
+        if digit < 0:
+            return None
+        number = number * BASE + digit
+    number = number * LETTERS + SHORT_LINK_ALPHABET.find(code[0])
+    if number >= SHORT_LINK_MODULUS:
+        return None
+    pk = number * INVERSE % SHORT_LINK_MODULUS
+    # Один рецепт — один код: отбрасываем варианты с лишними нулями.
+    return pk if encode(pk) == code else None
+
+
+def cache_key(pk):
+    return f'short-link:{pk}'
+
+
+def recipe_exists(pk):
+    exists = cache.get(cache_key(pk))
+    if exists is None:
+        exists = Recipe.objects.filter(pk=pk).exists()
+        cache.set(cache_key(pk), exists, settings.SHORT_LINK_CACHE_TIMEOUT)
+    return exists
+
+
+async def arecipe_exists(pk):
+    exists = await cache.aget(cache_key(pk))
+    if exists is None:
+        exists = await Recipe.objects.filter(pk=pk).aexists()
+        await cache.aset(
+            cache_key(pk), exists, settings.SHORT_LINK_CACHE_TIMEOUT
+        )
+    return exists
+
+
+def forget(*pks):
+    """Сбрасывает кэш после создания или удаления рецептов."""
+
+    cache.delete_many([cache_key(pk) for pk in pks])
+
+
+class ClickCounter:
+    """Счётчик переходов, сбрасываемый в БД пачками."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clicks = Counter()
+        self.flushed_at = time.monotonic()
+
+    def add(self, pk):
+        """Учитывает переход; True, если пора сбросить пачку в БД."""
+
+        with self.lock:
+            self.clicks[pk] += 1
+            return (
+                self.clicks.total() >= settings.SHORT_LINK_CLICKS_BATCH
+                or time.monotonic() - self.flushed_at
+                >= settings.SHORT_LINK_CLICKS_INTERVAL
+            )
+
+    def flush(self):
+        with self.lock:
+            clicks, self.clicks = self.clicks, Counter()
+            self.flushed_at = time.monotonic()
+        with transaction.atomic():
+            for pk, count in sorted(clicks.items()):
+                Recipe.objects.filter(pk=pk).update(
+                    short_link_clicks=F('short_link_clicks') + count
+                )
+
+
+clicks = ClickCounter()
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import short_links
+from .deletion import log_author_removals, log_recipe_removals
+from .models import (Favorite, Recipe, RelationChange, ShoppingCart,
+                     Subscription, User)
+
+# Рецепты recipe_ids сохранены вместе со связями (продукты, теги), например
+# в админке после инлайнов. Слушатель — карточки рецептов в api/signals.py.
+recipes_changed = Signal()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reset_short_link_cache(sender, instance, **kwargs):
+    """Сбрасывает кэш коротких ссылок при создании и удалении рецепта."""
+
+    if kwargs.get('created', True):
+        short_links.forget(instance.pk)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def log_relation_change(sender, instance, **kwargs):
+    """Пишет добавление или удаление связи в журнал RelationChange."""
+
+    created = kwargs.get('created')
+    if created is False:
+        return
+    RelationChange.objects.create(
+        user_id=instance.user_id,
+        kind=sender._meta.model_name,
+        object_id=(
+            instance.author_id if sender is Subscription
+            else instance.recipe_id
+        ),
+        added=bool(created)
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def log_recipe_relations_removal(sender, instance, **kwargs):
+    """Избранное и корзина рецепта удалятся каскадом в БД без сигналов."""
+
+    log_recipe_removals(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_delete, sender=User)
+def log_author_relations_removal(sender, instance, **kwargs):
+    """
+    Рецепты автора удалятся каскадом в БД без сигналов: связи всех его
+    рецептов пишутся в журнал одним INSERT ... SELECT, а кэш коротких
+    ссылок сбрасывается после фиксации удаления.
+    """
+
+    recipes = Recipe.objects.filter(author=instance)
+    log_recipe_removals(recipes)
+    log_author_removals(User.objects.filter(pk=instance.pk))
+    recipe_ids = list(recipes.values_list('pk', flat=True))
+    transaction.on_commit(lambda: short_links.forget(*recipe_ids))
@@ -0,0 +1,307 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from cookbook.models import (Favorite, Ingredient, Recipe, RecipeCard,
+                             RecipeIngredient, RecipeSimilarity, RecipeTag,
+                             RelationChange, ShoppingCart, Subscription, Tag)
+
+User = get_user_model()
+
+USERS = 200
+RECIPES_PER_AUTHOR = 25
+RELATIONS_PER_USER = 50
+INGREDIENTS = 100
+INGREDIENTS_PER_RECIPE = 4
+
+
+def index_names(model, columns):
+    """
+    Имена индексов и уникальных ограничений таблицы model по столбцам
+    columns (в SQLite уникальное ограничение — sqlite_autoindex_*).
+    """
+
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        names = {
+            name for name, constraint in
+            connection.introspection.get_constraints(cursor, table).items()
+            if constraint['columns'] == columns
+            and (constraint['index'] or constraint['unique'])
+        }
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'PRAGMA index_list({table})')
+            for name in [row[1] for row in cursor.fetchall()]:
+                cursor.execute(f'PRAGMA index_info("{name}")')
+                if [row[2] for row in cursor.fetchall()] == columns:
+                    names.add(name)
+    return names
+
+
+class QueryIndexTests(TestCase):
+    """
+    Планы запросов эндпоинтов используют ожидаемые индексы.
+
+    Таблицы заполняются объёмом, при котором полный просмотр дороже
+    индекса, и статистика собирается ANALYZE; настройки планировщика
+    не меняются.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(
+                username=f'user{number}',
+                email=f'user{number}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for number in range(USERS)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                name=f'Рецепт {number}',
+                text='Описание',
+                author=users[number % USERS],
+                cooking_time=10,
+            )
+            for number in range(USERS * RECIPES_PER_AUTHOR)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Продукт {number}', measurement_unit='г')
+            for number in range(INGREDIENTS)
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredients[
+                    (number + shift * 7) % INGREDIENTS
+                ],
+                amount=1,
+            )
+            for number, recipe in enumerate(recipes)
+            for shift in range(INGREDIENTS_PER_RECIPE)
+        )
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create(
+                model(user=user, recipe=recipes[
+                    (number * 31 + shift * 97) % len(recipes)
+                ])
+                for number, user in enumerate(users)
+                for shift in range(RELATIONS_PER_USER)
+            )
+        Subscription.objects.bulk_create(
+            Subscription(
+                user=user, author=users[(number + shift + 1) % USERS]
+            )
+            for number, user in enumerate(users)
+            for shift in range(RELATIONS_PER_USER)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.user, cls.author = users[0], users[1]
+        cls.recipe = recipes[0]
+
+    def assertUsesIndex(self, queryset, names):
+        plan = queryset.explain()
+        self.assertTrue(
+            any(
+                re.search(rf'\b{re.escape(name)}\b', plan) for name in names
+            ),
+            f'Ожидался индекс {" / ".join(sorted(names))}:\n{plan}'
+        )
+
+    def test_recipe_feed(self):
+        self.assertUsesIndex(
+            Recipe.objects.order_by('-pub_date')[:6],
+            {'recipe_pub_date_idx'}
+        )
+
+    def test_author_recipes(self):
+        self.assertUsesIndex(
+            Recipe.objects.filter(author=self.author).order_by(
+                '-pub_date'
+            )[:6],
+            {'recipe_author_pub_date_idx'}
+        )
+
+    def test_user_relations(self):
+        for model in (Favorite, ShoppingCart):
+            with self.subTest(model=model.__name__):
+                self.assertUsesIndex(
+                    model.objects.filter(user=self.user).order_by('-recipe'),
+                    index_names(model, ['user_id', 'recipe_id'])
+                )
+
+    def test_is_subscribed(self):
+        self.assertUsesIndex(
+            Subscription.objects.filter(user=self.user, author=self.author),
+            index_names(Subscription, ['user_id', 'author_id'])
+        )
+
+    def test_author_subscribers(self):
+        self.assertUsesIndex(
+            Subscription.objects.filter(author=self.author),
+            index_names(Subscription, ['author_id'])
+        )
+
+    def test_recipe_ingredients(self):
+        self.assertUsesIndex(
+            RecipeIngredient.objects.filter(recipe=self.recipe),
+            index_names(RecipeIngredient, ['recipe_id', 'ingredient_id'])
+            | index_names(RecipeIngredient, ['recipe_id'])
+        )
+
+
+class CascadeDeleteTests(TestCase):
+    """Удаление автора и рецепта каскадом в БД."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com'
+        )
+        cls.tag = Tag.objects.create(name='Ужин', slug='dinner')
+        cls.ingredient = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+
+    def create_author(self, username, recipes):
+        author = User.objects.create_user(
+            username=username, email=f'{username}@example.com'
+        )
+        Subscription.objects.create(user=self.reader, author=author)
+        created = Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {number}', text='-')
+            for number in range(recipes)
+        )
+        for recipe in created:
+            recipe.tags.add(self.tag)
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=self.ingredient, amount=1
+            )
+            RecipeCard.objects.create(recipe=recipe, document={})
+            Favorite.objects.create(user=self.reader, recipe=recipe)
+            ShoppingCart.objects.create(user=self.reader, recipe=recipe)
+        RecipeSimilarity.objects.bulk_create(
+            RecipeSimilarity(recipe=first, similar=second, score=0.5)
+            for first, second in zip(created, created[1:])
+        )
+        return author
+
+    def removals(self, kind):
+        return set(RelationChange.objects.filter(
+            user=self.reader, kind=kind, added=False
+        ).values_list('object_id', flat=True))
+
+    def test_author_cascade(self):
+        author = self.create_author('author', recipes=3)
+        author_id = author.id
+        recipe_ids = set(author.recipes.values_list('id', flat=True))
+        author.delete()
+        self.assertFalse(Recipe.objects.filter(id__in=recipe_ids).exists())
+        for model in (RecipeTag, RecipeIngredient, RecipeCard, Favorite,
+                      ShoppingCart, RecipeSimilarity):
+            with self.subTest(model=model.__name__):
+                self.assertFalse(
+                    model.objects.filter(recipe__in=recipe_ids).exists()
+                )
+        self.assertFalse(
+            Subscription.objects.filter(author=author_id).exists()
+        )
+        self.assertEqual(self.removals('favorite'), recipe_ids)
+        self.assertEqual(self.removals('shoppingcart'), recipe_ids)
+        self.assertEqual(self.removals('subscription'), {author_id})
+        self.assertTrue(Tag.objects.filter(pk=self.tag.pk).exists())
+
+    def test_recipe_cascade(self):
+        author = self.create_author('author', recipes=2)
+        recipe, other = author.recipes.order_by('id')
+        recipe_id = recipe.id
+        recipe.delete()
+        self.assertFalse(RecipeTag.objects.filter(recipe=recipe_id).exists())
+        self.assertFalse(
+            RecipeSimilarity.objects.filter(similar=recipe_id).exists()
+        )
+        self.assertTrue(RecipeTag.objects.filter(recipe=other).exists())
+        self.assertEqual(self.removals('favorite'), {recipe_id})
+        self.assertEqual(self.removals('shoppingcart'), {recipe_id})
+
+    def test_author_delete_queries_do_not_depend_on_recipes(self):
+        counts = []
+        for number, recipes in enumerate((1, 10)):
+            author = self.create_author(f'author{number}', recipes)
+            with CaptureQueriesContext(connection) as queries:
+                author.delete()
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class RecipeChangelistTests(TestCase):
+    """Число запросов списка рецептов в админке не зависит от рецептов."""
+
+    url = '/admin/cookbook/recipe/'
+    # Сессия, пользователь, варианты фильтров по тегам и авторам, счётчик
+    # страницы, рецепты, их теги и продукты.
+    QUERIES = 8
+    # Терцили времени готовки без кэша: в PostgreSQL — PERCENTILE_DISC и
+    # счётчики одним запросом каждый, в SQLite — ещё count и два OFFSET.
+    LIMITS_QUERIES = 2 if connection.vendor == 'postgresql' else 4
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='-'
+        )
+        cls.tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        )
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Продукт {number}', measurement_unit='г')
+            for number in range(3)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def create_recipes(self, count):
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=self.admin, name=f'Рецепт {number}', text='-',
+                cooking_time=number + 1
+            )
+            for number in range(Recipe.objects.count(), count)
+        )
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in self.tags
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+            for recipe in recipes for ingredient in self.ingredients
+        )
+
+    def get(self, params=None):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changelist_queries(self):
+        for count in (5, 50):
+            with self.subTest(recipes=count):
+                self.create_recipes(count)
+                cache.clear()
+                with self.assertNumQueries(
+                    self.QUERIES + self.LIMITS_QUERIES
+                ):
+                    self.get()
+                # Границы фильтра по времени готовки берутся из кэша.
+                with self.assertNumQueries(self.QUERIES):
+                    self.get()
+                with self.assertNumQueries(self.QUERIES):
+                    self.get({'cooking_time': 'short'})
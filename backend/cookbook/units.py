@@ -0,0 +1,54 @@
+"""
+Приведение количеств продуктов к базовым единицам.
+
+Выражения для БД пересчитывают количество в базовую единицу прямо в
+запросе, чтобы суммировать, например, граммы и килограммы одного продукта
+в одной группировке. humanize переводит сумму обратно в крупную единицу.
+"""
+from django.db.models import Case, F, FloatField, Value, When
+
+from .constants import MEASUREMENT_UNITS
+
+CONVERTED_UNITS = {
+    unit: (base_unit, factor)
+    for unit, (base_unit, factor) in MEASUREMENT_UNITS.items()
+    if unit != base_unit
+}
+
+
+def base_unit(unit_field):
+    """Базовая единица для поля с единицей измерения."""
+
+    return Case(
+        *(
+            When(**{unit_field: unit}, then=Value(base))
+            for unit, (base, _) in CONVERTED_UNITS.items()
+        ),
+        default=F(unit_field)
+    )
+
+
+def to_base(amount_field, unit_field):
+    """Количество в базовой единице для полей количества и единицы."""
+
+    return F(amount_field) * Case(
+        *(
+            When(**{unit_field: unit}, then=Value(float(factor)))
+            for unit, (_, factor) in CONVERTED_UNITS.items()
+        ),
+        default=Value(1.0),
+        output_field=FloatField()
+    )
+
+
+def humanize(amount, unit):
+    """
+    Переводит количество в базовой единице в самую крупную единицу,
+    в которой оно не меньше единицы: 1500 г -> 1.5 кг.
+    """
+
+    best_unit, best_factor = unit, 1
+    for name, (base, factor) in MEASUREMENT_UNITS.items():
+        if base == unit and best_factor < factor <= amount:
+            best_unit, best_factor = name, factor
+    return amount / best_factor, best_unit
@@ -3,5 +3,7 @@ from django.urls import path
 from .views import short_link_redirect
 
 urlpatterns = [
-    path('s/<int:pk>/', short_link_redirect, name='recipe-short-link')
+    # Старые ссылки с id рецепта.
+    path('s/<int:pk>/', short_link_redirect),
+    path('s/<str:code>/', short_link_redirect, name='recipe-short-link'),
 ]
@@ -1,10 +1,31 @@
-from django.core.exceptions import ValidationError
-from django.shortcuts import redirect
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import (Http404, HttpResponsePermanentRedirect,
+                         HttpResponseRedirect)
+from django.utils.cache import patch_cache_control
 
-from .models import Recipe
+from . import short_links
 
 
-def short_link_redirect(request, pk):
-    if not Recipe.objects.filter(id=pk).exists():
-        raise ValidationError(f'Рецепт с идентификатором {pk} не найден!')
-    return redirect(f'/recipes/{pk}')
+async def short_link_redirect(request, code=None, pk=None):
+    """
+    Переход по короткой ссылке /s/<код>/ (и старой /s/<id>/) на рецепт.
+
+    Существование рецепта проверяется по кэшу, ответ можно кэшировать.
+    """
+
+    if pk is None:
+        pk = short_links.decode(code)
+    if pk is None or not await short_links.arecipe_exists(pk):
+        raise Http404(f'Рецепт по ссылке {request.path} не найден!')
+    if settings.SHORT_LINK_CLICKS and short_links.clicks.add(pk):
+        await sync_to_async(short_links.clicks.flush)()
+    response_class = (
+        HttpResponsePermanentRedirect if settings.SHORT_LINK_PERMANENT
+        else HttpResponseRedirect
+    )
+    response = response_class(f'/recipes/{pk}')
+    patch_cache_control(
+        response, public=True, max_age=settings.SHORT_LINK_CACHE_MAX_AGE
+    )
+    return response
@@ -0,0 +1,13 @@
+import os
+
+# SERVER_MODE=asgi запускает Django через ASGI на воркерах uvicorn.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi').lower()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'backend.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'backend.wsgi:application'
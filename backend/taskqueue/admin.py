@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'name', 'status', 'attempts', 'max_attempts', 'run_after',
+        'updated_at'
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'idempotency_key')
+    readonly_fields = ('created_at', 'updated_at')
+    show_full_result_count = False
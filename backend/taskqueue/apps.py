@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TaskQueueConfig(AppConfig):
+    name = 'taskqueue'
+    verbose_name = 'Фоновые задачи'
+
+    def ready(self):
+        # Регистрирует задачи из модулей tasks.py всех приложений.
+        autodiscover_modules('tasks')
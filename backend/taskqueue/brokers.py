@@ -0,0 +1,214 @@
+"""
+Брокеры очереди задач.
+
+Брокер хранит сообщения — словари с ключами id, name, args, kwargs,
+attempts, max_attempts и idempotency_key — и выдаёт их воркеру.
+DatabaseBroker работает на таблице Task (SQLite в разработке, PostgreSQL в
+продакшене), RedisBroker — на Redis, EagerBroker выполняет задачу сразу.
+"""
+import json
+import math
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Task
+
+
+class BaseBroker:
+
+    def enqueue(self, message, run_after):
+        """Ставит задачу в очередь; False, если такая уже ждёт."""
+        raise NotImplementedError
+
+    def reserve(self):
+        """Забирает готовую к выполнению задачу или возвращает None."""
+        raise NotImplementedError
+
+    def complete(self, message):
+        raise NotImplementedError
+
+    def retry(self, message, error, run_after):
+        raise NotImplementedError
+
+    def fail(self, message, error):
+        raise NotImplementedError
+
+
+class EagerBroker(BaseBroker):
+    """Выполняет задачу сразу при постановке: для тестов и отладки."""
+
+    def enqueue(self, message, run_after):
+        from .queue import execute
+        execute({**message, 'attempts': 1}, self)
+        return True
+
+    def reserve(self):
+        return None
+
+    def complete(self, message):
+        pass
+
+    def retry(self, message, error, run_after):
+        pass
+
+    def fail(self, message, error):
+        pass
+
+
+class DatabaseBroker(BaseBroker):
+
+    def enqueue(self, message, run_after):
+        try:
+            with transaction.atomic():
+                Task.objects.create(
+                    name=message['name'],
+                    args=message['args'],
+                    kwargs=message['kwargs'],
+                    max_attempts=message['max_attempts'],
+                    idempotency_key=message['idempotency_key'],
+                    run_after=run_after,
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def reserve(self):
+        now = timezone.now()
+        # Задачи упавшего воркера возвращаются в очередь по таймауту.
+        stale = now - timedelta(seconds=settings.TASKS_VISIBILITY_TIMEOUT)
+        with transaction.atomic():
+            task = Task.objects.select_for_update(skip_locked=True).filter(
+                Q(status=Task.Status.PENDING, run_after__lte=now)
+                | Q(status=Task.Status.RUNNING, updated_at__lt=stale)
+            ).order_by('run_after').first()
+            if task is None:
+                return None
+            task.status = Task.Status.RUNNING
+            task.attempts += 1
+            task.save(update_fields=('status', 'attempts', 'updated_at'))
+        return {
+            'id': task.pk,
+            'name': task.name,
+            'args': task.args,
+            'kwargs': task.kwargs,
+            'attempts': task.attempts,
+            'max_attempts': task.max_attempts,
+            'idempotency_key': task.idempotency_key,
+        }
+
+    def complete(self, message):
+        Task.objects.filter(pk=message['id']).delete()
+
+    def retry(self, message, error, run_after):
+        try:
+            Task.objects.filter(pk=message['id']).update(
+                status=Task.Status.PENDING, run_after=run_after,
+                last_error=error, updated_at=timezone.now()
+            )
+        except IntegrityError:
+            # Пока задача выполнялась, такую же уже поставили заново.
+            self.complete(message)
+
+    def fail(self, message, error):
+        Task.objects.filter(pk=message['id']).update(
+            status=Task.Status.FAILED, last_error=error,
+            updated_at=timezone.now()
+        )
+
+
+class RedisBroker(BaseBroker):
+    """
+    Очередь в Redis: ожидающие задачи — в sorted set по времени запуска,
+    выполняемые — в hash с временем взятия, упавшие — в списке.
+    """
+
+    PENDING = 'taskqueue:pending'
+    RUNNING = 'taskqueue:running'
+    FAILED = 'taskqueue:failed'
+    KEY_PREFIX = 'taskqueue:key:'
+
+    def __init__(self):
+        import redis
+        self.redis = redis.Redis.from_url(settings.REDIS_URL)
+
+    def _push(self, message, run_after):
+        """
+        Ставит задачу в очередь, заняв её ключ идемпотентности; False,
+        если такая задача уже ждёт.
+        """
+
+        key = message['idempotency_key']
+        if key:
+            # Ключ снимается при взятии задачи (как условие status=pending
+            # в DatabaseBroker), поэтому живёт до её запуска. Запас
+            # TASKS_VISIBILITY_TIMEOUT освобождает ключ, если сообщение
+            # пропало из очереди.
+            timeout = max(run_after - time.time(), 0)
+            if not self.redis.set(
+                self.KEY_PREFIX + key, message['id'], nx=True,
+                ex=math.ceil(timeout + settings.TASKS_VISIBILITY_TIMEOUT)
+            ):
+                return False
+        self.redis.zadd(self.PENDING, {json.dumps(message): run_after})
+        return True
+
+    def enqueue(self, message, run_after):
+        return self._push(message, run_after.timestamp())
+
+    def _requeue_stale(self):
+        stale = time.time() - settings.TASKS_VISIBILITY_TIMEOUT
+        for raw, taken_at in self.redis.hgetall(self.RUNNING).items():
+            if float(taken_at) < stale and self.redis.hdel(self.RUNNING, raw):
+                self._push(json.loads(raw), time.time())
+
+    def reserve(self):
+        self._requeue_stale()
+        for raw in self.redis.zrangebyscore(
+            self.PENDING, '-inf', time.time(), start=0, num=10
+        ):
+            # Задачу получает тот воркер, который первым её удалил.
+            if self.redis.zrem(self.PENDING, raw):
+                message = json.loads(raw)
+                if message['idempotency_key']:
+                    self.redis.delete(
+                        self.KEY_PREFIX + message['idempotency_key']
+                    )
+                message['attempts'] += 1
+                self.redis.hset(
+                    self.RUNNING, json.dumps(message), time.time()
+                )
+                return message
+        return None
+
+    def complete(self, message):
+        self.redis.hdel(self.RUNNING, json.dumps(message))
+
+    def retry(self, message, error, run_after):
+        self.complete(message)
+        # Пока задача выполнялась, такую же уже поставили заново — тогда
+        # повтор не нужен.
+        self._push({**message, 'last_error': error}, run_after.timestamp())
+
+    def fail(self, message, error):
+        self.complete(message)
+        self.redis.lpush(
+            self.FAILED, json.dumps({**message, 'last_error': error})
+        )
+
+
+def new_message(name, args, kwargs, max_attempts, idempotency_key):
+    return {
+        'id': uuid.uuid4().hex,
+        'name': name,
+        'args': list(args),
+        'kwargs': kwargs,
+        'attempts': 0,
+        'max_attempts': max_attempts,
+        'idempotency_key': idempotency_key,
+    }
@@ -0,0 +1,51 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from taskqueue.queue import execute, get_broker
+
+
+class Command(BaseCommand):
+    help = 'Запустить воркер фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выполнить задачи из очереди и завершиться'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=1,
+            help='Пауза в секундах, когда очередь пуста'
+        )
+
+    def handle(self, *args, **options):
+        self.running = True
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        broker = get_broker()
+        done = failed = 0
+        self.stdout.write(f'Воркер запущен, брокер {type(broker).__name__}.')
+        while self.running:
+            # Как между HTTP-запросами: закрыть разорванные и устаревшие
+            # соединения с БД, иначе после перезапуска БД падали бы все
+            # следующие задачи.
+            close_old_connections()
+            message = broker.reserve()
+            if message is None:
+                if options['burst']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            if execute(message, broker):
+                done += 1
+            else:
+                failed += 1
+            close_old_connections()
+        self.stdout.write(self.style.SUCCESS(
+            f'Воркер остановлен. Выполнено: {done}, с ошибкой: {failed}.'
+        ))
+
+    def stop(self, signum, frame):
+        self.running = False
@@ -0,0 +1,55 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """
+    Задача в очереди DatabaseBroker. Выполненные задачи удаляются,
+    упавшие после всех попыток остаются со статусом failed.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        RUNNING = 'running', 'Выполняется'
+        FAILED = 'failed', 'Ошибка'
+
+    name = models.CharField('Задача', max_length=200)
+    args = models.JSONField('Аргументы', default=list)
+    kwargs = models.JSONField('Именованные аргументы', default=dict)
+    status = models.CharField(
+        'Статус', max_length=16, choices=Status.choices,
+        default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток', default=3
+    )
+    idempotency_key = models.CharField(
+        'Ключ идемпотентности', max_length=200, blank=True, null=True
+    )
+    run_after = models.DateTimeField('Выполнить после', default=timezone.now)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created_at = models.DateTimeField('Создана', auto_now_add=True)
+    updated_at = models.DateTimeField('Изменена', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        ordering = ('run_after',)
+        indexes = [
+            models.Index(
+                fields=['status', 'run_after'],
+                name='task_status_run_after_idx'
+            ),
+        ]
+        constraints = [
+            # Пока задача с ключом ждёт в очереди, вторую такую не ставим.
+            models.UniqueConstraint(
+                fields=['idempotency_key'],
+                condition=models.Q(status='pending'),
+                name='unique_active_task_idempotency_key'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_status_display()})'
@@ -0,0 +1,83 @@
+import logging
+import traceback
+from datetime import timedelta
+from functools import cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .brokers import new_message
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+@cache
+def get_broker():
+    return import_string(settings.TASKS_BROKER)()
+
+
+def enqueue(name, args=(), kwargs=None, *, max_attempts=3,
+            idempotency_key=None, countdown=0):
+    """
+    Ставит задачу в очередь после фиксации текущей транзакции.
+
+    Задача с idempotency_key не ставится повторно, пока такая же ждёт
+    выполнения.
+    """
+
+    message = new_message(
+        name, args, kwargs or {}, max_attempts, idempotency_key
+    )
+    run_after = timezone.now() + timedelta(seconds=countdown)
+    transaction.on_commit(
+        lambda: get_broker().enqueue(message, run_after)
+    )
+
+
+def task(name=None, max_attempts=3):
+    """
+    Регистрирует функцию как фоновую задачу.
+
+    Функция остаётся обычной, а func.delay(*args, idempotency_key=...,
+    countdown=..., **kwargs) ставит её в очередь. Аргументы должны
+    сериализоваться в JSON.
+    """
+
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = func
+
+        def delay(*args, idempotency_key=None, countdown=0, **kwargs):
+            enqueue(
+                task_name, args, kwargs, max_attempts=max_attempts,
+                idempotency_key=idempotency_key, countdown=countdown
+            )
+
+        func.task_name = task_name
+        func.delay = delay
+        return func
+    return decorator
+
+
+def execute(message, broker):
+    """Выполняет задачу и сообщает брокеру результат."""
+
+    try:
+        registry[message['name']](*message['args'], **message['kwargs'])
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Задача %s упала', message['name'])
+        if message['attempts'] < message['max_attempts']:
+            delay = settings.TASKS_RETRY_DELAY * 2 ** (message['attempts'] - 1)
+            broker.retry(
+                message, error, timezone.now() + timedelta(seconds=delay)
+            )
+        else:
+            broker.fail(message, error)
+        return False
+    broker.complete(message)
+    return True